@@ -1,6 +1,6 @@
 
 a = Analysis(
-    ['GUI.py', 'createCVgraph.py', 'genColors.py', 'loadExcel.py', 'processExcel.py'],
+    ['GUI.py', 'createCVgraph.py', 'genColors.py', 'loadExcel.py', 'processExcel.py', 'analyzeCycles.py', 'exportData.py', 'readerBackends.py', 'cycleDatasets.py', 'renderServer.py', 'fileCatalog.py', 'validateData.py', 'sharedCycles.py', 'prefetchDatasets.py'],
     pathex=['.'],  # Assuming all scripts are in the same directory
     binaries=[],
     datas=[('config.ini', '.')],  # Include config.ini
@@ -1,45 +1,27 @@
 import os
-import pickle
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, Canvas, colorchooser
+from tkinter import ttk, filedialog, messagebox, simpledialog, Canvas, colorchooser
 from tkinter.scrolledtext import ScrolledText
 import logging
 import configparser
 import webbrowser
-import time
-from loadExcel import load_excel_data, parse_temperature_from_filename
-from processExcel import process_data, store_processed_data, load_processed_data
-from createCVgraph import create_cv_graph, create_cv_graph_compare, extract_run_from_filename
+import multiprocessing
+from loadExcel import (load_excel_metadata, parse_temperature_from_filename, find_continuation_files,
+                       normalize_file_path, DEFAULT_CHANNEL_WORKERS)
+from cycleDatasets import load_cycle_datasets, describe_file_info, make_file_infos, remove_pickle_files
+from createCVgraph import create_cv_graph_compare, create_unique_filename, extract_run_from_filename
+from analyzeCycles import extract_features_table
+from exportData import export_cycle_data
+from fileCatalog import FileCatalog, DEFAULT_CATALOG_PATH
+from validateData import validation_settings
 from genColors import generate_gradient_colors
+from sharedCycles import render_graph_batch, shutdown_render_pool
+from prefetchDatasets import DatasetPrefetcher, DEFAULT_PREFETCH_WORKERS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 config_file = 'config.ini'
-
-MAX_PICKLE_FILE_AGE = 3600  # 1 hour in seconds
-
-def get_pickle_filename(file_path):
-    directory, file_name = os.path.split(file_path)
-    base_name, _ = os.path.splitext(file_name)
-    return os.path.join(directory, f"{base_name}_processed.pkl")
-
-def is_pickle_file_relevant(pickle_filename, smoothing_points):
-    if os.path.exists(pickle_filename):
-        file_age = time.time() - os.path.getmtime(pickle_filename)
-        if file_age < MAX_PICKLE_FILE_AGE:
-            with open(pickle_filename, 'rb') as file:
-                cycle_data = pickle.load(file)
-                # Check if the stored data was processed with the current smoothing points
-                if cycle_data.get('smoothing_points') == smoothing_points:
-                    return True
-    return False
-
-def remove_pickle_files(file_paths):
-    for file_path in file_paths:
-        pickle_filename = get_pickle_filename(file_path)
-        if os.path.exists(pickle_filename):
-            os.remove(pickle_filename)
-            logging.info(f"Deleted pickle file: {pickle_filename}")
+PREFETCH_DELAY_MS = 500
 
 def get_color_palettes(config_file, section='PALETTES'):
     section_started = False
@@ -72,7 +54,55 @@ def parse_cycle_range(cycle_range):
                 cycle_list.append(int(part))
     return cycle_list
 
-def create_graph():
+def get_reader_backend():
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return config['DEFAULT'].get('readerbackend', 'auto')
+
+def get_channel_workers():
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return int(config['DEFAULT'].get('channelworkers', DEFAULT_CHANNEL_WORKERS))
+
+def get_validation_settings():
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return validation_settings(config)
+
+def prefetch_load(infos, smoothing_points, validation, cancelled):
+    # Runs on prefetch worker threads, so progress goes to the log rather than the status bar
+    return load_cycle_datasets(infos, smoothing_points, get_reader_backend(), logging.info, catalog,
+                               validation, cancelled)
+
+def load_datasets(infos, smoothing_points):
+    # Processed cycle data for infos, starting from whatever the background prefetch finished
+    validation = get_validation_settings()
+    cycle_datasets = prefetcher.take(infos, smoothing_points, validation)
+    missing = [position for position, cycle_data in enumerate(cycle_datasets) if cycle_data is None]
+    if len(missing) < len(infos):
+        update_status(f"Using {len(infos) - len(missing)} prefetched dataset(s)")
+    if missing:
+        loaded = load_cycle_datasets([infos[position] for position in missing], smoothing_points, get_reader_backend(),
+                                     update_status, catalog, validation, channel_workers=get_channel_workers())
+        for position, cycle_data in zip(missing, loaded):
+            cycle_datasets[position] = cycle_data
+    return cycle_datasets
+
+def start_prefetch():
+    try:
+        smoothing_points = int(smoothing_points_var.get())
+    except ValueError:
+        return
+    prefetcher.prefetch(file_infos, smoothing_points, get_validation_settings())
+
+def schedule_prefetch(*args):
+    # Restart background processing once the smoothing entry has stopped changing
+    global prefetch_after_id
+    if prefetch_after_id is not None:
+        root.after_cancel(prefetch_after_id)
+    prefetch_after_id = root.after(PREFETCH_DELAY_MS, start_prefetch)
+
+def create_graph(mode='lines'):
     try:
         update_status("Starting graph creation...")
 
@@ -95,9 +125,11 @@ def create_graph():
         with open(config_file, 'w') as configfile:
             config.write(configfile)
 
-        for file_info in file_infos:
+        cycle_datasets = load_datasets(file_infos, smoothing_points)
+
+        jobs = []
+        for file_info, cycle_data in zip(file_infos, cycle_datasets):
             file_path = file_info['path']
-            mass = file_info['mass']
             cycle_list = parse_cycle_range(cycles_var.get())
             scan_rate = scan_rate_var.get()
             temperature = temp_var.get()
@@ -105,24 +137,9 @@ def create_graph():
             if temperature == 'auto':
                 temperature = parse_temperature_from_filename(file_path)
 
-            pickle_filename = get_pickle_filename(file_path)
-
-            if is_pickle_file_relevant(pickle_filename, smoothing_points):
-                update_status(f"Loading processed data from {pickle_filename}")
-                cycle_data = load_processed_data(pickle_filename)
-            else:
-                update_status("Loading Excel data...")
-                channel_data, _, temp_auto = load_excel_data(file_path)
-
-                update_status("Processing data...")
-                cycle_data = process_data(channel_data, mass, smoothing_points, file_path)
-                # Store the smoothing points used for processing
-                cycle_data['smoothing_points'] = smoothing_points
-                store_processed_data(cycle_data, pickle_filename)
-
             update_status(f"Cycle data has been loaded for file: {file_path}")
 
-            temp = temperature if temperature != 'auto' else temp_auto
+            temp = temperature
             color_palette = palette_var.get()
 
             if color_palette.lower().startswith('gradient'):
@@ -160,14 +177,14 @@ def create_graph():
                 "tick_width": float(config['DEFAULT']['tickwidth']),
             }
 
-            run_info = extract_run_from_filename(file_path)
-            update_status(f"Creating CV graph for {file_path}...")
-            create_cv_graph(cycle_data, temp, scan_rate, cycle_list, colors, graph_params, run_info)
-            update_status(f"Graph saved successfully to {output_directory}")
+            run_info = describe_file_info(file_info)
+            jobs.append((mode, cycle_data, (temp, scan_rate, cycle_list, colors, graph_params, run_info)))
 
-            filename = filename_template.format(temperature=temp) + ".png"
-            output_path = os.path.join(output_directory, filename)
+        # Several files are drawn in parallel worker processes that share the cycle arrays
+        update_status(f"Creating {len(jobs)} CV graph(s)...")
+        for output_path in render_graph_batch(jobs):
             webbrowser.open(output_path)
+        update_status(f"Graph saved successfully to {output_directory}")
 
         update_status("All graphs created successfully.")
 
@@ -201,28 +218,14 @@ def compare_cycles():
         with open(config_file, 'w') as configfile:
             config.write(configfile)
 
-        for file_info in file_infos:
+        cycle_datasets = load_datasets(file_infos, smoothing_points)
+
+        for file_info, cycle_data in zip(file_infos, cycle_datasets):
             file_path = file_info['path']
-            mass = file_info['mass']
             temperature = parse_temperature_from_filename(file_path)
 
-            pickle_filename = get_pickle_filename(file_path)
-
-            if is_pickle_file_relevant(pickle_filename, smoothing_points):
-                update_status(f"Loading processed data from {pickle_filename}")
-                cycle_data = load_processed_data(pickle_filename)
-            else:
-                update_status("Loading Excel data...")
-                channel_data, _, temp_auto = load_excel_data(file_path)
-
-                update_status("Processing data...")
-                cycle_data = process_data(channel_data, mass, smoothing_points, file_path)
-                # Store the smoothing points used for processing
-                cycle_data['smoothing_points'] = smoothing_points
-                store_processed_data(cycle_data, pickle_filename)
-
             cycle_data['filename'] = file_path
-            run_info = extract_run_from_filename(file_path)
+            run_info = describe_file_info(file_info)
             if run_info:
                 temperature = f"{temperature} - {run_info}"
 
@@ -230,7 +233,7 @@ def compare_cycles():
                 cycle_data_dict[temperature] = cycle_data
             else:
                 for key in cycle_data_dict[temperature]:
-                    if key != 'smoothing_points' and key != 'filename':
+                    if isinstance(key, int):
                         cycle_data_dict[temperature][key].extend(cycle_data[key])
                         
             update_status(f"Cycle data has been loaded for temperature: {temperature}")
@@ -277,7 +280,8 @@ def compare_cycles():
 
         update_status(f"Creating comparison graphs for cycles {cycle_list}...")
         for cycle_number in cycle_list:
-            create_cv_graph_compare(cycle_data_dict, [cycle_number], scan_rate, colors.copy(), graph_params)
+            create_cv_graph_compare(cycle_data_dict, [cycle_number], scan_rate, colors.copy(), graph_params,
+                                    average_replicates_var.get())
 
         update_status("Comparison graphs saved successfully.")
 
@@ -289,6 +293,69 @@ def compare_cycles():
         update_status(f"Error: {str(e)}")
         logging.error(str(e))
 
+def extract_features():
+    try:
+        update_status("Starting feature extraction...")
+
+        cycle_list = parse_cycle_range(cycles_var.get()) or None
+        smoothing_points = int(smoothing_points_var.get())
+        scan_rate = scan_rate_var.get()
+        output_directory = output_dir.get()
+
+        cycle_data_dict = {}
+        cycle_datasets = load_datasets(file_infos, smoothing_points)
+        for file_info, cycle_data in zip(file_infos, cycle_datasets):
+            file_path = file_info['path']
+
+            label = parse_temperature_from_filename(file_path)
+            run_info = describe_file_info(file_info)
+            if run_info:
+                label = f"{label} - {run_info}"
+            if label in cycle_data_dict:
+                label = f"{label} ({os.path.basename(file_path)})"
+            cycle_data_dict[label] = cycle_data
+
+        update_status("Extracting peak, onset and charge features...")
+        features = extract_features_table(cycle_data_dict, scan_rate, cycle_list)
+
+        os.makedirs(output_directory, exist_ok=True)
+        output_path = create_unique_filename(output_directory, "{temperature}_CV-Features", "Comparison", extension="csv")
+        features.to_csv(output_path, index=False)
+        update_status(f"Features for {len(features)} cycles saved to {output_path}")
+
+    except Exception as e:
+        update_status(f"Error: {str(e)}")
+        logging.error(str(e))
+
+def export_data():
+    try:
+        output_path = filedialog.asksaveasfilename(
+            initialdir=output_dir.get(),
+            initialfile="CV_Processed_Data.parquet",
+            defaultextension=".parquet",
+            filetypes=[("Parquet files", "*.parquet"), ("CSV files", "*.csv")])
+        if not output_path:
+            return
+
+        update_status("Starting data export...")
+        smoothing_points = int(smoothing_points_var.get())
+
+        def iter_datasets():
+            # Load lazily so only one workbook's processed cycles are held at a time
+            workbooks = {}
+            for file_info in file_infos:
+                workbooks.setdefault(file_info['path'], []).append(file_info)
+            for file_path, infos in workbooks.items():
+                for file_info, cycle_data in zip(infos, load_datasets(infos, smoothing_points)):
+                    yield (cycle_data, parse_temperature_from_filename(file_path), extract_run_from_filename(file_path),
+                           file_info.get('channel'))
+
+        rows_written = export_cycle_data(iter_datasets(), output_path)
+        update_status(f"Exported {rows_written} rows to {output_path}")
+
+    except Exception as e:
+        update_status(f"Error: {str(e)}")
+        logging.error(str(e))
 
 def update_config_file():
     config = configparser.ConfigParser()
@@ -318,18 +385,71 @@ def update_config_file():
         config.write(configfile)
 
 
+def format_file_info(info):
+    channel = f" [{info['channel']}]" if info.get('channel_label') else ""
+    return f"{info['path']}{channel} (Mass: {info['mass']} g)"
+
 def browse_files_popup():
     def add_file():
-        filepaths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx"), ("All Files", "*.*")])
+        filepaths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx"), ("Arbin CSV exports", "*.csv *.tsv"), ("All Files", "*.*")])
         for filepath in filepaths:
+            # Split exports ('_Wb_1', '_Wb_2', ...) are read as one dataset from their first part.
+            # Paths are normalised so dialog and catalog spellings of a file compare equal.
+            filepath = find_continuation_files(normalize_file_path(filepath))[0]
+            if any(info['path'] == filepath for info in file_infos):
+                continue
             try:
-                _, mass, _ = load_excel_data(filepath)
-                file_infos.append({'path': filepath, 'mass': mass})
+                # Catalogued files that have not changed are added without being opened
+                entry = catalog.lookup(filepath)
+                if entry is not None:
+                    mass, channel_sheets = entry['mass'], entry['channel_sheets']
+                else:
+                    mass, channel_sheets, _ = load_excel_metadata(filepath, get_reader_backend())
+                if mass is None:
+                    # CSV exports carry no Global_Info sheet to read the mass from
+                    mass = simpledialog.askfloat("Active Mass", f"Enter the mass (g) for {os.path.basename(filepath)}:",
+                                                 parent=popup, minvalue=0.0)
+                    if mass is None:
+                        continue
+                if entry is None or entry['mass'] != mass:
+                    catalog.record_file_in_background(filepath, mass, channel_sheets)
+                file_infos.extend(make_file_infos(filepath, mass, channel_sheets))
             except Exception as e:
                 update_status(f"Error loading mass from file: {str(e)}")
                 logging.error(str(e))
         update_file_list()
 
+    def add_from_catalog():
+        search = tk.Toplevel(popup)
+        search.title("Add from Catalog")
+
+        temperature_var = tk.StringVar()
+        run_var = tk.StringVar()
+        min_cycles_var = tk.StringVar()
+        for row, (label, variable) in enumerate([("Temperature (°C):", temperature_var),
+                                                 ("Run:", run_var),
+                                                 ("Minimum cycles:", min_cycles_var)]):
+            tk.Label(search, text=label).grid(row=row, column=0, padx=10, pady=5, sticky=tk.W)
+            tk.Entry(search, textvariable=variable).grid(row=row, column=1, padx=10, pady=5)
+
+        def run_query():
+            try:
+                matches = catalog.query_datasets(
+                    temperature=temperature_var.get().strip() or None,
+                    run=run_var.get().strip() or None,
+                    min_cycles=min_cycles_var.get().strip() or None)
+            except Exception as e:
+                messagebox.showwarning("Error", f"Catalog query failed: {str(e)}", parent=search)
+                return
+            known = {(info['path'], info.get('channel')) for info in file_infos}
+            added = [info for info in matches if (info['path'], info['channel']) not in known]
+            file_infos.extend(added)
+            update_status(f"Added {len(added)} of {len(matches)} catalogued dataset(s)")
+            update_file_list()
+            search.destroy()
+
+        tk.Button(search, text="Add Matches", command=run_query).grid(row=3, column=0, columnspan=2, pady=10)
+
     def remove_selected_file():
         selected_items = file_listbox.curselection()
         if not selected_items:
@@ -337,30 +457,35 @@ def browse_files_popup():
             return
         for selected in reversed(selected_items):
             del file_infos[selected]
+        # Drop any background work for the removed files
+        start_prefetch()
         update_file_list()
 
     def update_file_list():
         file_listbox.delete(0, tk.END)
         for info in file_infos:
-            file_listbox.insert(tk.END, f"{info['path']} (Mass: {info['mass']} g)")
+            file_listbox.insert(tk.END, format_file_info(info))
 
     def confirm_selection():
         selected_files_text.delete(1.0, tk.END)
         for info in file_infos:
-            selected_files_text.insert(tk.END, f"{info['path']} (Mass: {info['mass']} g)\n")
+            selected_files_text.insert(tk.END, format_file_info(info) + "\n")
         popup.destroy()
+        # Start loading and smoothing now so the data is ready by the time a graph is requested
+        start_prefetch()
 
     popup = tk.Toplevel(root)
     popup.title("Select Excel Files")
 
     tk.Button(popup, text="Add Files", command=add_file).grid(row=0, column=0, padx=10, pady=5)
     tk.Button(popup, text="Remove Selected", command=remove_selected_file).grid(row=0, column=1, padx=10, pady=5)
+    tk.Button(popup, text="Add from Catalog", command=add_from_catalog).grid(row=0, column=2, padx=10, pady=5)
 
     file_listbox = tk.Listbox(popup, selectmode=tk.MULTIPLE, width=80)
-    file_listbox.grid(row=1, column=0, columnspan=2, padx=10, pady=5)
+    file_listbox.grid(row=1, column=0, columnspan=3, padx=10, pady=5)
 
     confirm_button = tk.Button(popup, text="Confirm Selection", command=confirm_selection)
-    confirm_button.grid(row=2, column=0, columnspan=2, pady=10)
+    confirm_button.grid(row=2, column=0, columnspan=3, pady=10)
 
     update_file_list()
 
@@ -408,102 +533,120 @@ def choose_end_color():
 
 def on_closing():
     update_status("Deleting temporary pickle files...")
-    remove_pickle_files([file_info['path'] for file_info in file_infos])
+    if not prefetcher.shutdown():
+        logging.warning("Background loads are still running; their results may outlive this session")
+    shutdown_render_pool()
+    remove_pickle_files(file_infos)
+    catalog.close()
     root.destroy()
 
-root = tk.Tk()
-root.title("CV Graph Generator")
-root.protocol("WM_DELETE_WINDOW", on_closing)  # Bind the close window protocol to on_closing
+if __name__ == "__main__":
+    # Render workers re-import this module; only the main process builds the window
+    multiprocessing.freeze_support()
+
+    root = tk.Tk()
+    root.title("CV Graph Generator")
+    root.protocol("WM_DELETE_WINDOW", on_closing)  # Bind the close window protocol to on_closing
+
+    config = configparser.ConfigParser()
+    config.read(config_file)
 
-config = configparser.ConfigParser()
-config.read(config_file)
+    file_infos = []
+    catalog = FileCatalog(config['DEFAULT'].get('catalogpath', DEFAULT_CATALOG_PATH))
+    prefetcher = DatasetPrefetcher(prefetch_load, int(config['DEFAULT'].get('prefetchworkers', DEFAULT_PREFETCH_WORKERS)))
+    prefetch_after_id = None
 
-file_infos = []
+    palette_options = get_color_palettes(config_file)
 
-palette_options = get_color_palettes(config_file)
+    tk.Label(root, text="Select data files:").grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+    tk.Button(root, text="Manage Files", command=browse_files_popup).grid(row=0, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Select data files:").grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
-tk.Button(root, text="Manage Files", command=browse_files_popup).grid(row=0, column=1, padx=10, pady=5)
+    selected_files_text = ScrolledText(root, height=5, width=50)
+    selected_files_text.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
 
-selected_files_text = ScrolledText(root, height=5, width=50)
-selected_files_text.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
+    tk.Label(root, text="Output directory:").grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
+    output_dir = tk.StringVar(value=config['DEFAULT']['outputdirectory'])
+    tk.Entry(root, textvariable=output_dir, width=50).grid(row=2, column=1, padx=10, pady=5)
+    tk.Button(root, text="Browse", command=browse_dir).grid(row=2, column=2, padx=10, pady=5)
 
-tk.Label(root, text="Output directory:").grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
-output_dir = tk.StringVar(value=config['DEFAULT']['outputdirectory'])
-tk.Entry(root, textvariable=output_dir, width=50).grid(row=2, column=1, padx=10, pady=5)
-tk.Button(root, text="Browse", command=browse_dir).grid(row=2, column=2, padx=10, pady=5)
+    tk.Label(root, text="Color palette:").grid(row=3, column=0, padx=10, pady=5, sticky=tk.W)
+    palette_var = tk.StringVar(value=palette_options[0] if palette_options else 'Custom')
+    palette_combobox = ttk.Combobox(root, textvariable=palette_var, values=palette_options, state="readonly")
+    palette_combobox.grid(row=3, column=1, padx=10, pady=5)
+    palette_combobox.bind("<<ComboboxSelected>>", update_palette_preview)
 
-tk.Label(root, text="Color palette:").grid(row=3, column=0, padx=10, pady=5, sticky=tk.W)
-palette_var = tk.StringVar(value=palette_options[0] if palette_options else 'Custom')
-palette_combobox = ttk.Combobox(root, textvariable=palette_var, values=palette_options, state="readonly")
-palette_combobox.grid(row=3, column=1, padx=10, pady=5)
-palette_combobox.bind("<<ComboboxSelected>>", update_palette_preview)
+    preview_canvas = Canvas(root, width=200, height=20)
+    preview_canvas.grid(row=3, column=2, padx=10, pady=5)
 
-preview_canvas = Canvas(root, width=200, height=20)
-preview_canvas.grid(row=3, column=2, padx=10, pady=5)
+    tk.Label(root, text="Start Color:").grid(row=4, column=0, padx=10, pady=5, sticky=tk.W)
+    start_color_var = tk.StringVar(value="#0000FF")
+    start_color_entry = tk.Entry(root, textvariable=start_color_var, width=10)
+    start_color_button = tk.Button(root, text="Choose...", command=choose_start_color)
 
-tk.Label(root, text="Start Color:").grid(row=4, column=0, padx=10, pady=5, sticky=tk.W)
-start_color_var = tk.StringVar(value="#0000FF")
-start_color_entry = tk.Entry(root, textvariable=start_color_var, width=10)
-start_color_button = tk.Button(root, text="Choose...", command=choose_start_color)
+    tk.Label(root, text="End Color:").grid(row=5, column=0, padx=10, pady=5, sticky=tk.W)
+    end_color_var = tk.StringVar(value="#FF0000")
+    end_color_entry = tk.Entry(root, textvariable=end_color_var, width=10)
+    end_color_button = tk.Button(root, text="Choose...", command=choose_end_color)
 
-tk.Label(root, text="End Color:").grid(row=5, column=0, padx=10, pady=5, sticky=tk.W)
-end_color_var = tk.StringVar(value="#FF0000")
-end_color_entry = tk.Entry(root, textvariable=end_color_var, width=10)
-end_color_button = tk.Button(root, text="Choose...", command=choose_end_color)
+    tk.Label(root, text="Cycles to display / compare (e.g., 1-4,6,8):").grid(row=6, column=0, padx=10, pady=5, sticky=tk.W)
+    cycles_var = tk.StringVar(value="1-6")
+    tk.Entry(root, textvariable=cycles_var).grid(row=6, column=1, padx=10, pady=5)
+    cycles_var.trace("w", update_palette_preview)
 
-tk.Label(root, text="Cycles to display / compare (e.g., 1-4,6,8):").grid(row=6, column=0, padx=10, pady=5, sticky=tk.W)
-cycles_var = tk.StringVar(value="1-6")
-tk.Entry(root, textvariable=cycles_var).grid(row=6, column=1, padx=10, pady=5)
-cycles_var.trace("w", update_palette_preview)
+    tk.Label(root, text="Scan rate (mV/s):").grid(row=7, column=0, padx=10, pady=5, sticky=tk.W)
+    scan_rate_var = tk.StringVar(value="0.2")
+    tk.Entry(root, textvariable=scan_rate_var).grid(row=7, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Scan rate (mV/s):").grid(row=7, column=0, padx=10, pady=5, sticky=tk.W)
-scan_rate_var = tk.StringVar(value="0.2")
-tk.Entry(root, textvariable=scan_rate_var).grid(row=7, column=1, padx=10, pady=5)
+    tk.Label(root, text="Temperature:").grid(row=8, column=0, padx=10, pady=5, sticky=tk.W)
+    temp_var = tk.StringVar(value="auto")
+    tk.Entry(root, textvariable=temp_var).grid(row=8, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Temperature:").grid(row=8, column=0, padx=10, pady=5, sticky=tk.W)
-temp_var = tk.StringVar(value="auto")
-tk.Entry(root, textvariable=temp_var).grid(row=8, column=1, padx=10, pady=5)
+    tk.Label(root, text="X Axis Min:").grid(row=9, column=0, padx=10, pady=5, sticky=tk.W)
+    x_min_var = tk.StringVar(value=config['DEFAULT']['xaxismin'])
+    tk.Entry(root, textvariable=x_min_var).grid(row=9, column=1, padx=10, pady=5)
 
-tk.Label(root, text="X Axis Min:").grid(row=9, column=0, padx=10, pady=5, sticky=tk.W)
-x_min_var = tk.StringVar(value=config['DEFAULT']['xaxismin'])
-tk.Entry(root, textvariable=x_min_var).grid(row=9, column=1, padx=10, pady=5)
+    tk.Label(root, text="X Axis Max:").grid(row=10, column=0, padx=10, pady=5, sticky=tk.W)
+    x_max_var = tk.StringVar(value=config['DEFAULT']['xaxismax'])
+    tk.Entry(root, textvariable=x_max_var).grid(row=10, column=1, padx=10, pady=5)
 
-tk.Label(root, text="X Axis Max:").grid(row=10, column=0, padx=10, pady=5, sticky=tk.W)
-x_max_var = tk.StringVar(value=config['DEFAULT']['xaxismax'])
-tk.Entry(root, textvariable=x_max_var).grid(row=10, column=1, padx=10, pady=5)
+    tk.Label(root, text="Y Axis Min:").grid(row=11, column=0, padx=10, pady=5, sticky=tk.W)
+    y_min_var = tk.StringVar(value=config['DEFAULT']['yaxismin'])
+    tk.Entry(root, textvariable=y_min_var).grid(row=11, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Y Axis Min:").grid(row=11, column=0, padx=10, pady=5, sticky=tk.W)
-y_min_var = tk.StringVar(value=config['DEFAULT']['yaxismin'])
-tk.Entry(root, textvariable=y_min_var).grid(row=11, column=1, padx=10, pady=5)
+    tk.Label(root, text="Y Axis Max:").grid(row=12, column=0, padx=10, pady=5, sticky=tk.W)
+    y_max_var = tk.StringVar(value=config['DEFAULT']['yaxismax'])
+    tk.Entry(root, textvariable=y_max_var).grid(row=12, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Y Axis Max:").grid(row=12, column=0, padx=10, pady=5, sticky=tk.W)
-y_max_var = tk.StringVar(value=config['DEFAULT']['yaxismax'])
-tk.Entry(root, textvariable=y_max_var).grid(row=12, column=1, padx=10, pady=5)
+    tk.Label(root, text="Major Tick Interval:").grid(row=13, column=0, padx=10, pady=5, sticky=tk.W)
+    major_tick_var = tk.StringVar(value=config['DEFAULT'].get('majortickinterval', '50'))
+    tk.Entry(root, textvariable=major_tick_var).grid(row=13, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Major Tick Interval:").grid(row=13, column=0, padx=10, pady=5, sticky=tk.W)
-major_tick_var = tk.StringVar(value=config['DEFAULT'].get('majortickinterval', '50'))
-tk.Entry(root, textvariable=major_tick_var).grid(row=13, column=1, padx=10, pady=5)
+    grid_var = tk.BooleanVar(value=config['DEFAULT'].getboolean('showgrid'))
+    grid_checkbox = tk.Checkbutton(root, text="Show Gridlines", variable=grid_var)
+    grid_checkbox.grid(row=14, column=0, padx=10, pady=5)
 
-grid_var = tk.BooleanVar(value=config['DEFAULT'].getboolean('showgrid'))
-grid_checkbox = tk.Checkbutton(root, text="Show Gridlines", variable=grid_var)
-grid_checkbox.grid(row=14, column=0, padx=10, pady=5)
+    tk.Label(root, text="Filename Template:").grid(row=15, column=0, padx=10, pady=5, sticky=tk.W)
+    filename_template_var = tk.StringVar(value=config['DEFAULT'].get('filenametemplate', '{temperature}_CV-Graph'))
+    tk.Entry(root, textvariable=filename_template_var).grid(row=15, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Filename Template:").grid(row=15, column=0, padx=10, pady=5, sticky=tk.W)
-filename_template_var = tk.StringVar(value=config['DEFAULT'].get('filenametemplate', '{temperature}_CV-Graph'))
-tk.Entry(root, textvariable=filename_template_var).grid(row=15, column=1, padx=10, pady=5)
+    tk.Label(root, text="Points of Savitzky-Golay Filtering:").grid(row=16, column=0, padx=10, pady=5, sticky=tk.W)
+    smoothing_points_var = tk.StringVar(value=config['DEFAULT']['smoothingpoints'])
+    smoothing_points_var.trace("w", lambda *args: update_config_file())
+    smoothing_points_var.trace("w", schedule_prefetch)
+    tk.Entry(root, textvariable=smoothing_points_var).grid(row=16, column=1, padx=10, pady=5)
 
-tk.Label(root, text="Points of Savitzky-Golay Filtering:").grid(row=16, column=0, padx=10, pady=5, sticky=tk.W)
-smoothing_points_var = tk.StringVar(value=config['DEFAULT']['smoothingpoints'])
-smoothing_points_var.trace("w", lambda *args: update_config_file())
-tk.Entry(root, textvariable=smoothing_points_var).grid(row=16, column=1, padx=10, pady=5)
+    average_replicates_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(root, text="Average replicate runs (mean ± SD)", variable=average_replicates_var).grid(row=17, column=0, padx=10, pady=5)
 
-tk.Button(root, text="Create Graph", command=create_graph).grid(row=19, column=0, pady=20)
-tk.Button(root, text="Compare Cycles", command=compare_cycles).grid(row=19, column=1, pady=20)
+    tk.Button(root, text="Create Graph", command=create_graph).grid(row=19, column=0, pady=20)
+    tk.Button(root, text="Compare Cycles", command=compare_cycles).grid(row=19, column=1, pady=20)
+    tk.Button(root, text="Extract Features", command=extract_features).grid(row=19, column=2, pady=20)
+    tk.Button(root, text="Export Data", command=export_data).grid(row=19, column=3, pady=20)
+    tk.Button(root, text="Cycle Heatmap", command=lambda: create_graph('heatmap')).grid(row=19, column=4, pady=20)
 
-status_label = tk.Label(root, text="")
-status_label.grid(row=20, column=0, columnspan=3, pady=10)
+    status_label = tk.Label(root, text="")
+    status_label.grid(row=20, column=0, columnspan=3, pady=10)
 
-update_palette_preview()
+    update_palette_preview()
 
-root.mainloop()
+    root.mainloop()
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import logging
+import warnings
+from processExcel import cycle_data_to_arrays, processed_columns, TIME_COLUMN
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VOLTAGE_COLUMN = 'Voltage(V)'
+CURRENT_COLUMN = 'Smoothed Current (mA)'
+DENSITY_COLUMN = 'Smoothed Current Density (mA g^-1)'
+
+FEATURE_COLUMNS = [
+    'Cycle',
+    'Anodic Peak Potential (V)',
+    'Anodic Peak Current (mA)',
+    'Anodic Peak Current Density (mA g^-1)',
+    'Cathodic Peak Potential (V)',
+    'Cathodic Peak Current (mA)',
+    'Cathodic Peak Current Density (mA g^-1)',
+    'Peak Separation (V)',
+    'Anodic Onset Potential (V)',
+    'Cathodic Onset Potential (V)',
+    'Anodic Charge (mAh g^-1)',
+    'Cathodic Charge (mAh g^-1)',
+]
+
+def segment_ids(offsets):
+    # Cycle position of every sample in the flattened arrays
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def segment_extreme(values, offsets, reducer):
+    # Extreme value of every cycle and the index of the first sample that reaches it
+    extremes = reducer.reduceat(values, offsets[:-1])
+    ids = segment_ids(offsets)
+    hits = np.flatnonzero(values == extremes[ids])
+    _, first = np.unique(ids[hits], return_index=True)
+    return hits[first], extremes
+
+def sweep_direction(voltage, offsets):
+    # +1 for anodic (rising potential) samples, -1 for cathodic ones. Each cycle is split
+    # at its two vertices, the first samples at its highest and lowest potential, instead
+    # of following the sign of every step, which measurement noise flips. Samples up to
+    # the first vertex sweep towards it, samples up to the second vertex sweep back, and
+    # the rest sweep towards the first vertex again.
+    high, _ = segment_extreme(np.where(np.isnan(voltage), -np.inf, voltage), offsets, np.maximum)
+    low, _ = segment_extreme(np.where(np.isnan(voltage), np.inf, voltage), offsets, np.minimum)
+    ids = segment_ids(offsets)
+    first_vertex = np.minimum(high, low)[ids]
+    second_vertex = np.maximum(high, low)[ids]
+    first_direction = np.where(high < low, 1, -1)[ids]
+    positions = np.arange(len(voltage))
+    return np.where((positions > first_vertex) & (positions <= second_vertex), -first_direction, first_direction)
+
+def interpolate_groups_to_grid(voltage, values, groups, num_groups, grid):
+    # Linearly interpolate many (potential, value) curves onto one grid with a single
+    # np.interp call: every group is shifted onto its own stretch of the potential axis.
+    # Grid points outside a group's measured potential window are NaN.
+    order = np.lexsort((voltage, groups))
+    voltage, values, groups = voltage[order], values[order], groups[order]
+    low = min(voltage.min(), grid.min())
+    span = max(voltage.max(), grid.max()) - low + 1.0
+
+    queries = (grid - low)[np.newaxis, :] + (np.arange(num_groups) * span)[:, np.newaxis]
+    result = np.interp(queries.ravel(), voltage - low + groups * span, values).reshape(num_groups, len(grid))
+
+    # Each group is sorted by potential, so its window runs from its first to its last sample
+    starts = np.searchsorted(groups, np.arange(num_groups), side='left')
+    stops = np.searchsorted(groups, np.arange(num_groups), side='right')
+    present = stops > starts
+    group_min = np.where(present, voltage[np.minimum(starts, len(voltage) - 1)], np.inf)
+    group_max = np.where(present, voltage[np.maximum(stops - 1, 0)], -np.inf)
+    result[(grid[np.newaxis, :] < group_min[:, np.newaxis]) | (grid[np.newaxis, :] > group_max[:, np.newaxis])] = np.nan
+    return result
+
+def resample_cycles_to_grid(cycle_data, grid, cycle_list=None, column=DENSITY_COLUMN):
+    # Resample every cycle onto the potential grid, separately for the anodic and
+    # cathodic sweeps, in one vectorized pass over all cycles.
+    # Returns the cycle indices and two (cycles x grid) images.
+    cycle_indices, offsets, arrays = cycle_data_to_arrays(cycle_data, [VOLTAGE_COLUMN, column], cycle_list)
+    grid = np.asarray(grid, dtype=np.float64)
+    num_cycles = len(cycle_indices)
+    if num_cycles == 0:
+        empty = np.empty((0, len(grid)))
+        return cycle_indices, empty, empty.copy()
+
+    voltage = arrays[VOLTAGE_COLUMN]
+    values = arrays[column]
+    sweep = (sweep_direction(voltage, offsets) < 0).astype(np.int64)
+    groups = sweep * num_cycles + segment_ids(offsets)
+
+    valid = ~(np.isnan(voltage) | np.isnan(values))
+    images = interpolate_groups_to_grid(voltage[valid], values[valid], groups[valid], 2 * num_cycles, grid)
+    return cycle_indices, images[:num_cycles], images[num_cycles:]
+
+def average_replicate_cycles(cycle_datas, cycle_number, grid, column=DENSITY_COLUMN):
+    # Mean and sample standard deviation (ddof=1) of one cycle across replicate runs. Every
+    # run's anodic and cathodic sweeps are interpolated onto the grid together in one
+    # np.interp call. The deviation is NaN wherever fewer than two runs cover the grid point.
+    # Returns (mean, std, count) arrays of shape (2, grid): row 0 anodic, row 1 cathodic.
+    grid = np.asarray(grid, dtype=np.float64)
+    runs = [cycle_data[cycle_number] for cycle_data in cycle_datas if cycle_number in cycle_data]
+    runs = [data for data in runs if len(data[VOLTAGE_COLUMN]) > 0]
+    if not runs:
+        empty = np.full((2, len(grid)), np.nan)
+        return empty, empty.copy(), np.zeros((2, len(grid)), dtype=np.int64)
+
+    lengths = np.array([len(data[VOLTAGE_COLUMN]) for data in runs], dtype=np.int64)
+    offsets = np.zeros(len(runs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    voltage = np.concatenate([np.asarray(data[VOLTAGE_COLUMN], dtype=np.float64) for data in runs])
+    values = np.concatenate([np.asarray(data[column], dtype=np.float64) for data in runs])
+
+    num_runs = len(runs)
+    sweep = (sweep_direction(voltage, offsets) < 0).astype(np.int64)
+    groups = sweep * num_runs + segment_ids(offsets)
+    valid = ~(np.isnan(voltage) | np.isnan(values))
+    curves = interpolate_groups_to_grid(voltage[valid], values[valid], groups[valid], 2 * num_runs, grid)
+    curves = curves.reshape(2, num_runs, len(grid))
+
+    count = np.sum(~np.isnan(curves), axis=1)
+    with warnings.catch_warnings():
+        # Grid points that no run covers are expected to be NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mean = np.nanmean(curves, axis=1)
+        std = np.nanstd(curves, axis=1, ddof=1)
+    std[count < 2] = np.nan
+    return mean, std, count
+
+def extract_cycle_features(cycle_data, scan_rate, cycle_list=None, onset_fraction=0.1):
+    scan_rate = float(scan_rate)
+    if scan_rate <= 0:
+        raise ValueError(f"Scan rate must be positive to integrate charge: {scan_rate}")
+
+    columns = [VOLTAGE_COLUMN, CURRENT_COLUMN, DENSITY_COLUMN]
+    if TIME_COLUMN in processed_columns(cycle_data):
+        columns.append(TIME_COLUMN)
+    cycle_indices, offsets, arrays = cycle_data_to_arrays(cycle_data, columns, cycle_list)
+    if len(cycle_indices) == 0:
+        return pd.DataFrame(columns=FEATURE_COLUMNS)
+
+    voltage = arrays[VOLTAGE_COLUMN]
+    current = arrays[CURRENT_COLUMN]
+    density = arrays[DENSITY_COLUMN]
+    starts = offsets[:-1]
+    ids = segment_ids(offsets)
+
+    anodic_index, anodic_peak = segment_extreme(density, offsets, np.maximum)
+    cathodic_index, cathodic_peak = segment_extreme(density, offsets, np.minimum)
+
+    # Onset is the potential at the foot of each peak, where the current density first
+    # passes onset_fraction of the peak value. Only the sweep that drives the peak counts:
+    # rising potential for the anodic onset, falling potential for the cathodic one.
+    direction = sweep_direction(voltage, offsets)
+    anodic_mask = (direction > 0) & (anodic_peak[ids] > 0) & (density >= onset_fraction * anodic_peak[ids])
+    anodic_onset = np.minimum.reduceat(np.where(anodic_mask, voltage, np.inf), starts)
+    cathodic_mask = (direction < 0) & (cathodic_peak[ids] < 0) & (density <= onset_fraction * cathodic_peak[ids])
+    cathodic_onset = np.maximum.reduceat(np.where(cathodic_mask, voltage, -np.inf), starts)
+    anodic_onset[np.isinf(anodic_onset)] = np.nan
+    cathodic_onset[np.isinf(cathodic_onset)] = np.nan
+
+    # Integrate the current density over time with the trapezoidal rule. The time step
+    # is the recorded Test_Time(s) step where the export has one; otherwise it follows
+    # from the potential step and the scan rate (mV/s). Intervals that straddle two
+    # cycles are zeroed out.
+    time_step = np.abs(np.diff(voltage)) / (scan_rate / 1000)
+    if TIME_COLUMN in arrays:
+        recorded = np.diff(arrays[TIME_COLUMN])
+        time_step = np.where(np.isfinite(recorded) & (recorded >= 0), recorded, time_step)
+    mean_density = (density[:-1] + density[1:]) / 2
+    same_cycle = ids[:-1] == ids[1:]
+    charge = np.where(same_cycle, mean_density * time_step, 0.0) / 3600
+    charge = np.append(charge, 0.0)
+    anodic_charge = np.add.reduceat(np.clip(charge, 0, None), starts)
+    cathodic_charge = np.add.reduceat(np.clip(charge, None, 0), starts)
+
+    features = pd.DataFrame({
+        'Cycle': cycle_indices,
+        'Anodic Peak Potential (V)': voltage[anodic_index],
+        'Anodic Peak Current (mA)': current[anodic_index],
+        'Anodic Peak Current Density (mA g^-1)': anodic_peak,
+        'Cathodic Peak Potential (V)': voltage[cathodic_index],
+        'Cathodic Peak Current (mA)': current[cathodic_index],
+        'Cathodic Peak Current Density (mA g^-1)': cathodic_peak,
+        'Peak Separation (V)': voltage[anodic_index] - voltage[cathodic_index],
+        'Anodic Onset Potential (V)': anodic_onset,
+        'Cathodic Onset Potential (V)': cathodic_onset,
+        'Anodic Charge (mAh g^-1)': anodic_charge,
+        'Cathodic Charge (mAh g^-1)': cathodic_charge,
+    }, columns=FEATURE_COLUMNS)
+
+    logging.info(f"Extracted features for {len(features)} cycles.")
+    return features
+
+def extract_features_table(cycle_data_dict, scan_rate, cycle_list=None, onset_fraction=0.1):
+    # One row per cycle per dataset, keyed by the same labels used for comparison graphs
+    tables = []
+    for label, cycle_data in cycle_data_dict.items():
+        features = extract_cycle_features(cycle_data, scan_rate, cycle_list, onset_fraction)
+        features.insert(0, 'File', cycle_data.get('filename'))
+        features.insert(0, 'Dataset', label)
+        tables.append(features)
+
+    if not tables:
+        return pd.DataFrame(columns=['Dataset', 'File'] + FEATURE_COLUMNS)
+    return pd.concat(tables, ignore_index=True)
@@ -7,15 +7,16 @@ import configparser
 from matplotlib.colors import LinearSegmentedColormap
 import numpy as np
 import re
+from analyzeCycles import resample_cycles_to_grid, average_replicate_cycles
 
-def create_unique_filename(directory, filename_template, temperature, cycle_number=None):
+def create_unique_filename(directory, filename_template, temperature, cycle_number=None, extension="png"):
     base_filename = filename_template.format(temperature=temperature)
     if cycle_number is not None:
         base_filename += f"_Cycle{cycle_number}"
-    filename = f"{base_filename}.png"
+    filename = f"{base_filename}.{extension}"
     counter = 1
     while os.path.exists(os.path.join(directory, filename)):
-        filename = f"{base_filename}_{counter}.png"
+        filename = f"{base_filename}_{counter}.{extension}"
         counter += 1
     return os.path.join(directory, filename)
 
@@ -26,8 +27,45 @@ def extract_run_from_filename(filename):
 def parse_temperature_key(temp):
     temp_parts = temp.split(" - ")
     temperature = re.findall(r'\d+', temp_parts[0])[0]
-    run = temp_parts[1].split()[1] if len(temp_parts) > 1 else 0
-    return int(temperature), int(run)
+    run_match = re.search(r'Run (\d+)', temp)
+    run = run_match.group(1) if run_match else 0
+    # Fall back to the full label so channels of the same run sort consistently
+    return int(temperature), int(run), temp
+
+def replicate_group_label(label):
+    # '25°C - Run 1' and '25°C - Run 2' are replicates of '25°C'
+    return " - ".join(part for part in label.split(" - ") if not re.fullmatch(r'Run \d+', part))
+
+def potential_grid(voltage_arrays, x_min, x_max, points):
+    # Evenly spaced potentials over the axis limits, or over the data where they are 'auto'
+    if x_min == 'auto':
+        x_min = min(np.min(voltage) for voltage in voltage_arrays)
+    if x_max == 'auto':
+        x_max = max(np.max(voltage) for voltage in voltage_arrays)
+    return np.linspace(x_min, x_max, points)
+
+def plot_replicate_bands(ax, cycle_data_dict, cycle_number, colors, line_weight, x_bounds, grid_points=400):
+    # One mean curve per group of replicate runs, with a shaded mean ± standard deviation band
+    groups = {}
+    for label, cycle_data in cycle_data_dict.items():
+        groups.setdefault(replicate_group_label(label), []).append(cycle_data)
+
+    color_cycle = cycle(colors)
+    for group_label in sorted(groups, key=parse_temperature_key):
+        cycle_datas = [cycle_data for cycle_data in groups[group_label] if cycle_number in cycle_data]
+        if not cycle_datas:
+            print(f"Cycle {cycle_number} not found in data for temperature {group_label}.")
+            continue
+        color = next(color_cycle)
+
+        grid = potential_grid([cycle_data[cycle_number]['Voltage(V)'] for cycle_data in cycle_datas],
+                              x_bounds[0], x_bounds[1], grid_points)
+        mean, std, _ = average_replicate_cycles(cycle_datas, cycle_number, grid)
+        for sweep in range(2):
+            ax.fill_between(grid, mean[sweep] - std[sweep], mean[sweep] + std[sweep],
+                            color=color, alpha=0.25, linewidth=0)
+            ax.plot(grid, mean[sweep], color=color, linewidth=line_weight,
+                    label=f'{group_label} (n={len(cycle_datas)})' if sweep == 0 else None)
 
 def create_cv_graph(cycle_data, temperature, scan_rate, cycle_list, colors, graph_params, run_info=None):
     # Use values from graph_params
@@ -136,8 +174,88 @@ def create_cv_graph(cycle_data, temperature, scan_rate, cycle_list, colors, grap
     plt.savefig(output_path, dpi=dpi)
     print(f"Graph saved to {output_path}")
     plt.close()
+    return output_path
 
-def create_cv_graph_compare(cycle_data_dict, cycle_list, scan_rate, colors, graph_params):
+def create_cv_heatmap(cycle_data, temperature, scan_rate, cycle_list, colors, graph_params, run_info=None):
+    # One image per sweep direction of cycle number vs potential, colored by smoothed
+    # current density. Render cost depends on the grid size, not the number of cycles.
+    font_family = graph_params["font_family"]
+    font_size = graph_params["font_size"]
+    tick_font_size = graph_params["tick_font_size"]
+    x_min = graph_params["x_min"]
+    x_max = graph_params["x_max"]
+    output_dir = graph_params["output_dir"]
+    filename_template = graph_params["filename_template"]
+    axis_line_weight = graph_params["axis_line_weight"]
+    width = graph_params["width"]
+    height = graph_params["height"]
+    dpi = graph_params["dpi"]
+    tick_length = graph_params["tick_length"]
+    tick_width = graph_params["tick_width"]
+    grid_points = int(graph_params.get("heatmap_points", 400))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not colors or len(colors) < 2:
+        raise ValueError("At least two colors are needed for a heatmap color scale.")
+    if not all(isinstance(c, str) and c.startswith('#') for c in colors):
+        raise ValueError("Invalid color values provided. All colors should be hex strings starting with '#'.")
+
+    cycles = [cycle_index for cycle_index in cycle_list if cycle_index in cycle_data]
+    if not cycles:
+        raise ValueError(f"None of the requested cycles {cycle_list} were found in the data.")
+
+    grid = potential_grid([cycle_data[c]['Voltage(V)'] for c in cycles], x_min, x_max, grid_points)
+    x_min, x_max = grid[0], grid[-1]
+    cycle_indices, anodic, cathodic = resample_cycles_to_grid(cycle_data, grid, cycles)
+
+    # Lay the cycles out on a contiguous axis so that skipped cycles show up as gaps
+    first_cycle, last_cycle = cycle_indices.min(), cycle_indices.max()
+    rows = cycle_indices - first_cycle
+    extent = (x_min, x_max, first_cycle - 0.5, last_cycle + 0.5)
+
+    prop_bold = fm.FontProperties(family=font_family, size=font_size, weight='bold')
+    prop_regular = fm.FontProperties(family=font_family, size=font_size)
+
+    cmap = LinearSegmentedColormap.from_list("custom_gradient", colors)
+    cmap.set_bad('white')
+
+    fig, axes = plt.subplots(2, 1, figsize=(width, height), sharex=True)
+    for ax, image, sweep_label in zip(axes, (anodic, cathodic), ('Anodic sweep', 'Cathodic sweep')):
+        full_image = np.full((last_cycle - first_cycle + 1, grid_points), np.nan)
+        full_image[rows] = image
+        heatmap = ax.imshow(full_image, aspect='auto', origin='lower', extent=extent, cmap=cmap, interpolation='nearest')
+
+        cbar = fig.colorbar(heatmap, ax=ax, orientation='vertical')
+        cbar.set_label(r'Current Density / mA g$^{\mathbf{-1}}$', fontsize=font_size, fontproperties=prop_bold)
+        cbar.ax.tick_params(labelsize=tick_font_size)
+
+        ax.set_ylabel('Cycle Number', fontsize=font_size, fontproperties=prop_bold, labelpad=20)
+        ax.text(0.97, 0.9, sweep_label, transform=ax.transAxes, fontsize=font_size, fontproperties=prop_regular,
+                horizontalalignment='right', verticalalignment='top')
+        ax.tick_params(axis='both', which='major', labelsize=tick_font_size, length=tick_length, width=tick_width)
+        ax.yaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+        for spine in ax.spines.values():
+            spine.set_linewidth(axis_line_weight)
+
+    axes[-1].set_xlabel('Potential / V', fontsize=font_size, fontproperties=prop_bold, labelpad=20)
+    axes[-1].xaxis.set_major_locator(ticker.MultipleLocator(0.2))
+    axes[-1].xaxis.set_minor_locator(ticker.MultipleLocator(0.1))
+
+    scan_rate_text = f'${scan_rate} \\ \\mathrm{{mV}} \\ \\mathrm{{s}}^{{-1}}$'
+    temp_label = temperature if run_info is None else f'{temperature} - {run_info}'
+    axes[0].set_title(f'{temp_label}    {scan_rate_text}', fontsize=font_size, fontproperties=prop_bold)
+
+    fig.tight_layout()
+
+    output_path = create_unique_filename(output_dir, filename_template + "_Heatmap", temperature)
+    plt.savefig(output_path, dpi=dpi)
+    print(f"Graph saved to {output_path}")
+    plt.close()
+    return output_path
+
+def create_cv_graph_compare(cycle_data_dict, cycle_list, scan_rate, colors, graph_params, average_replicates=False):
+    output_paths = []
     for cycle_number in cycle_list:
         # Use values from graph_params
         font_family = graph_params["font_family"]
@@ -180,22 +298,25 @@ def create_cv_graph_compare(cycle_data_dict, cycle_list, scan_rate, colors, grap
 
         fig, ax = plt.subplots(figsize=(width, height))
 
-        # Adjust sorting so that temperatures with runs are handled properly
-        sorted_temps = sorted(cycle_data_dict.keys(), key=lambda x: parse_temperature_key(x))
-        color_cycle = cycle(colors)
+        if average_replicates:
+            plot_replicate_bands(ax, cycle_data_dict, cycle_number, colors, line_weight, x_bounds)
+        else:
+            # Adjust sorting so that temperatures with runs are handled properly
+            sorted_temps = sorted(cycle_data_dict.keys(), key=lambda x: parse_temperature_key(x))
+            color_cycle = cycle(colors)
         
-        for temperature in sorted_temps:
-            cycle_data = cycle_data_dict[temperature]
-            if cycle_number in cycle_data:
-                data = cycle_data[cycle_number]
-                color = next(color_cycle)
-
-                run_info = extract_run_from_filename(cycle_data["filename"])
-                temp_label = temperature  # temperature string already includes run info if applicable
-                ax.plot(data['Voltage(V)'], data['Smoothed Current Density (mA g^-1)'],
-                        label=f'{temp_label}', color=color, linewidth=line_weight)
-            else:
-                print(f"Cycle {cycle_number} not found in data for temperature {temperature}.")
+            for temperature in sorted_temps:
+                cycle_data = cycle_data_dict[temperature]
+                if cycle_number in cycle_data:
+                    data = cycle_data[cycle_number]
+                    color = next(color_cycle)
+
+                    run_info = extract_run_from_filename(cycle_data["filename"])
+                    temp_label = temperature  # temperature string already includes run info if applicable
+                    ax.plot(data['Voltage(V)'], data['Smoothed Current Density (mA g^-1)'],
+                            label=f'{temp_label}', color=color, linewidth=line_weight)
+                else:
+                    print(f"Cycle {cycle_number} not found in data for temperature {temperature}.")
 
         ax.set_xlabel('Potential / V', fontsize=font_size, fontproperties=prop_bold, labelpad=20)
         ax.set_ylabel(r'Current Density / mA g$^{\mathbf{-1}}$', fontsize=font_size, fontproperties=prop_bold, labelpad=20)
@@ -235,3 +356,6 @@ def create_cv_graph_compare(cycle_data_dict, cycle_list, scan_rate, colors, grap
         plt.savefig(output_path, dpi=dpi)
         print(f"Graph saved to {output_path}")
         plt.close()
+        output_paths.append(output_path)
+
+    return output_paths
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+import functools
+from loadExcel import load_excel_channels
+from processExcel import (process_data, store_processed_data, load_processed_data, load_processed_descriptor,
+                          remove_processed_data)
+from createCVgraph import extract_run_from_filename
+from validateData import validation_signature
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_PICKLE_FILE_AGE = 3600  # 1 hour in seconds
+
+class LoadCancelled(Exception):
+    pass
+
+def abort_when_cancelled(chunks, cancelled):
+    # Pass sheet chunks through, stopping between sheets once the load is no longer wanted
+    for chunk in chunks:
+        if cancelled():
+            raise LoadCancelled("Dataset load cancelled")
+        yield chunk
+
+def process_channel_chunks(channel, chunks, mass, smoothing_points, file_path, validation=None, cancelled=None):
+    # Each channel is processed as its sheets stream in
+    if cancelled is not None:
+        chunks = abort_when_cancelled(chunks, cancelled)
+    return process_data(chunks, mass, smoothing_points, file_path, **(validation or {}))
+
+def get_pickle_filename(file_path, channel=None):
+    directory, file_name = os.path.split(file_path)
+    base_name, _ = os.path.splitext(file_name)
+    if channel:
+        base_name = f"{base_name}_{channel}"
+    return os.path.join(directory, f"{base_name}_processed.pkl")
+
+def is_pickle_file_relevant(pickle_filename, smoothing_points, validation=None):
+    if os.path.exists(pickle_filename):
+        file_age = time.time() - os.path.getmtime(pickle_filename)
+        if file_age < MAX_PICKLE_FILE_AGE:
+            descriptor = load_processed_descriptor(pickle_filename)
+            if descriptor is None:
+                return False
+            metadata = descriptor['metadata']
+            # Check if the stored data was processed with the current smoothing points
+            # and cleaned with the current bad row settings
+            if (metadata.get('smoothing_points') == smoothing_points
+                    and metadata.get('validation') == validation_signature(**(validation or {}))):
+                return True
+    return False
+
+def remove_pickle_files(file_infos):
+    for file_info in file_infos:
+        pickle_filename = get_pickle_filename(file_info['path'], file_info.get('channel'))
+        if os.path.exists(pickle_filename):
+            remove_processed_data(pickle_filename)
+            logging.info(f"Deleted pickle file: {pickle_filename}")
+
+def make_file_infos(file_path, mass, channel_sheets):
+    # One dataset per channel; they all share the workbook's Global_Info mass
+    return [{
+        'path': file_path,
+        'mass': mass,
+        'channel': channel,
+        'channel_label': channel if len(channel_sheets) > 1 else None,
+    } for channel in channel_sheets]
+
+def load_cycle_datasets(infos, smoothing_points, backend='auto', status=logging.info, catalog=None, validation=None,
+                        cancelled=None, session_pickles=True, channel_workers=1):
+    # Processed cycle data for every file info, in order. Each workbook is opened once
+    # for all of its channels that are not already cached. Newly processed datasets are
+    # recorded in the catalog when one is given. validation holds the bad row policy and
+    # voltage limits passed on to process_data (see validation_settings). cancelled is polled
+    # between sheets and raises LoadCancelled once it returns True. With a catalog, processed
+    # datasets of catalogued files live in its persistent cache instead of session pickles.
+    # Callers that hold datasets themselves pass session_pickles=False to leave the data
+    # directories untouched. Up to channel_workers processes parse the channels of a large
+    # workbook concurrently; cancellable loads stay in-process so they can stop between sheets.
+    results = [None] * len(infos)
+    pending = {}
+    signature = validation_signature(**(validation or {}))
+
+    for position, info in enumerate(infos):
+        if catalog is not None and info.get('channel'):
+            cycle_data = catalog.load_cached_dataset(info['path'], info['channel'], info['mass'], smoothing_points,
+                                                     signature)
+            if cycle_data is not None:
+                status(f"Loaded catalogued data for {info['path']} ({info['channel']})")
+                results[position] = cycle_data
+                continue
+        pickle_filename = get_pickle_filename(info['path'], info.get('channel'))
+        if session_pickles and is_pickle_file_relevant(pickle_filename, smoothing_points, validation):
+            status(f"Loading processed data from {pickle_filename}")
+            results[position] = load_processed_data(pickle_filename)
+        else:
+            pending.setdefault(info['path'], []).append(position)
+
+    for file_path, positions in pending.items():
+        channels = list(dict.fromkeys(infos[position].get('channel') for position in positions))
+        mass = infos[positions[0]]['mass']
+        status(f"Loading and processing {len(channels)} channel(s) from {file_path}...")
+
+        process_channel = functools.partial(process_channel_chunks, mass=mass, smoothing_points=smoothing_points,
+                                            file_path=file_path, validation=validation, cancelled=cancelled)
+        processed, _, _ = load_excel_channels(file_path, None if None in channels else channels,
+                                              consume_channel=process_channel, backend=backend,
+                                              max_workers=channel_workers if cancelled is None else 1)
+
+        for position in positions:
+            info = infos[position]
+            channel = info.get('channel') or next(iter(processed))
+            cycle_data = processed[channel]
+            # Store the smoothing points used for processing
+            cycle_data['smoothing_points'] = smoothing_points
+            cache_path = catalog.record_dataset(file_path, channel, mass, cycle_data) if catalog is not None else None
+            if cache_path is None and session_pickles:
+                store_processed_data(cycle_data, get_pickle_filename(file_path, info.get('channel')))
+            results[position] = cycle_data
+
+    return results
+
+def describe_file_info(file_info):
+    # Run and channel qualifiers shown next to the temperature in graph labels
+    parts = [extract_run_from_filename(file_info['path']), file_info.get('channel_label')]
+    return " - ".join(part for part in parts if part) or None
@@ -0,0 +1,115 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from processExcel import cycle_data_to_arrays
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DATA_COLUMNS = [
+    'Voltage(V)',
+    'Current(A)',
+    'Current (mA)',
+    'Current Density (mA g^-1)',
+    'Smoothed Current (mA)',
+    'Smoothed Current Density (mA g^-1)',
+]
+LABEL_COLUMNS = ['File', 'Temperature', 'Run', 'Channel']
+KEY_COLUMNS = LABEL_COLUMNS + ['Cycle', 'Point']
+
+DEFAULT_CHUNK_ROWS = 500000
+
+def detect_export_format(output_path):
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension == '.csv':
+        return 'csv'
+    raise ValueError(f"Unsupported export format for '{output_path}'. Use .parquet or .csv")
+
+def iter_long_chunks(datasets, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Yield (labels, columns) slices of at most chunk_rows samples straight from the
+    # flattened cycle arrays, one file at a time
+    for cycle_data, temperature, run, channel in datasets:
+        cycle_indices, offsets, arrays = cycle_data_to_arrays(cycle_data, DATA_COLUMNS)
+        total_rows = int(offsets[-1])
+        if total_rows == 0:
+            continue
+
+        lengths = np.diff(offsets)
+        cycles = np.repeat(cycle_indices, lengths)
+        points = np.arange(total_rows, dtype=np.int64) - np.repeat(offsets[:-1], lengths)
+        labels = {
+            'File': os.path.basename(str(cycle_data.get('filename', ''))),
+            'Temperature': temperature or '',
+            'Run': run or '',
+            'Channel': channel or '',
+        }
+
+        for start in range(0, total_rows, chunk_rows):
+            stop = min(start + chunk_rows, total_rows)
+            columns = {'Cycle': cycles[start:stop], 'Point': points[start:stop]}
+            for column in DATA_COLUMNS:
+                columns[column] = arrays[column][start:stop]
+            yield labels, columns
+
+def write_parquet(datasets, output_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    if pa is None:
+        raise ImportError("Parquet export requires the 'pyarrow' package. Install it or export to .csv instead.")
+
+    schema = pa.schema(
+        [(column, pa.dictionary(pa.int32(), pa.string())) for column in LABEL_COLUMNS]
+        + [('Cycle', pa.int64()), ('Point', pa.int64())]
+        + [(column, pa.float64()) for column in DATA_COLUMNS]
+    )
+
+    rows_written = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for labels, columns in iter_long_chunks(datasets, chunk_rows):
+            num_rows = len(columns['Cycle'])
+            # Repeated labels are stored once per chunk as dictionary entries
+            indices = pa.array(np.zeros(num_rows, dtype=np.int32))
+            arrays = [pa.DictionaryArray.from_arrays(indices, pa.array([labels[column]], type=pa.string()))
+                      for column in LABEL_COLUMNS]
+            arrays += [pa.array(columns[column]) for column in ['Cycle', 'Point'] + DATA_COLUMNS]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows_written += num_rows
+    return rows_written
+
+def write_csv(datasets, output_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    rows_written = 0
+    with open(output_path, 'w', newline='') as file:
+        for labels, columns in iter_long_chunks(datasets, chunk_rows):
+            chunk = pd.DataFrame(columns, copy=False)
+            for position, column in enumerate(LABEL_COLUMNS):
+                chunk.insert(position, column, labels[column])
+            chunk.to_csv(file, header=rows_written == 0, index=False)
+            rows_written += len(chunk)
+    if rows_written == 0:
+        # Still leave a valid, header-only file behind
+        with open(output_path, 'w', newline='') as file:
+            file.write(','.join(KEY_COLUMNS + DATA_COLUMNS) + '\n')
+    return rows_written
+
+def export_cycle_data(datasets, output_path, file_format=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # datasets is an iterable of (cycle_data, temperature, run, channel) tuples
+    file_format = file_format or detect_export_format(output_path)
+    logging.info(f"Exporting processed cycles to {output_path} ({file_format})")
+
+    if file_format == 'parquet':
+        rows_written = write_parquet(datasets, output_path, chunk_rows)
+    elif file_format == 'csv':
+        rows_written = write_csv(datasets, output_path, chunk_rows)
+    else:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    logging.info(f"Exported {rows_written} rows to {output_path}")
+    return rows_written
@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from loadExcel import parse_temperature_from_filename, find_continuation_files, normalize_file_path
+from processExcel import cycle_data_to_arrays, store_processed_data, load_processed_data, remove_processed_data
+from createCVgraph import extract_run_from_filename
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_CATALOG_PATH = 'catalog.sqlite'
+HASH_BLOCK_SIZE = 1 << 20
+SCHEMA_VERSION = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    content_hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    mass REAL,
+    temperature TEXT,
+    temperature_c INTEGER,
+    run TEXT,
+    channel_sheets TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, path)
+);
+CREATE INDEX IF NOT EXISTS files_by_path ON files (path);
+CREATE INDEX IF NOT EXISTS files_by_temperature ON files (temperature_c, run);
+
+CREATE TABLE IF NOT EXISTS datasets (
+    content_hash TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    cycle_count INTEGER NOT NULL,
+    mass REAL,
+    smoothing_points INTEGER,
+    cache_path TEXT,
+    processed_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, channel)
+);
+
+CREATE TABLE IF NOT EXISTS cycles (
+    content_hash TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    cycle_index INTEGER NOT NULL,
+    voltage_min REAL NOT NULL,
+    voltage_max REAL NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (content_hash, channel, cycle_index),
+    FOREIGN KEY (content_hash, channel) REFERENCES datasets (content_hash, channel) ON DELETE CASCADE
+);
+'''
+
+def file_signature(file_path):
+    # Total size and latest mtime across a split export's parts
+    stats = [os.stat(part_path) for part_path in find_continuation_files(file_path)]
+    return sum(stat.st_size for stat in stats), max(stat.st_mtime for stat in stats)
+
+def file_content_hash(file_path):
+    # SHA-256 over every byte of every part. This reads the whole export, so the GUI
+    # queues it through FileCatalog.record_file_in_background.
+    digest = hashlib.sha256()
+    for part_path in find_continuation_files(file_path):
+        digest.update(str(os.path.getsize(part_path)).encode('ascii'))
+        with open(part_path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def temperature_celsius(temperature):
+    match = re.search(r'-?\d+', str(temperature)) if temperature is not None else None
+    return int(match.group(0)) if match else None
+
+class FileCatalog:
+    # Persistent record of ingested workbooks so that files can be found, filtered and
+    # added to a comparison set without opening them again. Processed datasets are kept
+    # in cache_dir, keyed by content hash, and outlive the session pickles.
+    def __init__(self, path=DEFAULT_CATALOG_PATH, cache_dir=None):
+        self.path = path
+        self.cache_dir = cache_dir or f"{os.path.splitext(path)[0]}_cache"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Shared by the GUI and background loader threads; access is serialized
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.reset()
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        # File hashing runs here, one file at a time, off the caller's thread
+        self.recorder = ThreadPoolExecutor(max_workers=1)
+
+    def reset(self):
+        # Catalogs written by an older version are rebuilt; everything in them can be re-ingested
+        logging.info(f"Rebuilding catalog {self.path} for schema version {SCHEMA_VERSION}")
+        self.connection.executescript('DROP TABLE IF EXISTS cycles; DROP TABLE IF EXISTS datasets; '
+                                      'DROP TABLE IF EXISTS files;')
+        self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        for file_name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, file_name))
+
+    def close(self):
+        # Let queued file records finish before the connection goes away
+        self.recorder.shutdown(wait=True)
+        self.connection.close()
+
+    def lookup(self, file_path):
+        # The catalog entry for an unchanged file, or None if it is new or was modified
+        file_path = normalize_file_path(file_path)
+        size, mtime = file_signature(file_path)
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT * FROM files WHERE path = ? AND size = ? AND mtime = ? ORDER BY ingested_at DESC LIMIT 1',
+                (file_path, size, mtime)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['channel_sheets'] = json.loads(entry['channel_sheets'])
+        return entry
+
+    def record_file(self, file_path, mass, channel_sheets):
+        file_path = normalize_file_path(file_path)
+        size, mtime = file_signature(file_path)
+        content_hash = file_content_hash(file_path)
+        temperature = parse_temperature_from_filename(file_path)
+        with self.lock, self.connection:
+            # Every path gets its own entry; copies of a file share the processed datasets of its content
+            self.connection.execute(
+                '''INSERT INTO files (content_hash, path, size, mtime, mass, temperature, temperature_c, run,
+                                      channel_sheets, ingested_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (content_hash, path) DO UPDATE SET
+                       size = excluded.size, mtime = excluded.mtime, mass = excluded.mass,
+                       temperature = excluded.temperature, temperature_c = excluded.temperature_c,
+                       run = excluded.run, channel_sheets = excluded.channel_sheets''',
+                (content_hash, file_path, size, mtime, mass, temperature, temperature_celsius(temperature),
+                 extract_run_from_filename(file_path), json.dumps(list(channel_sheets)), time.time()))
+            # Earlier versions of a modified file no longer describe what is on disk, and
+            # their datasets go too once no other path still holds that content
+            self.connection.execute('DELETE FROM files WHERE path = ? AND content_hash != ?', (file_path, content_hash))
+            orphaned = 'datasets.content_hash NOT IN (SELECT content_hash FROM files)'
+            stale = self.connection.execute(f'SELECT cache_path FROM datasets WHERE {orphaned}').fetchall()
+            self.connection.execute(f'DELETE FROM datasets WHERE {orphaned}')
+        for row in stale:
+            if row['cache_path']:
+                remove_processed_data(row['cache_path'])
+        logging.info(f"Catalogued {file_path} ({len(channel_sheets)} channel(s))")
+        return content_hash
+
+    def record_file_in_background(self, file_path, mass, channel_sheets):
+        # record_file without blocking the caller on hashing the file. Datasets loaded
+        # before it finishes are processed again and kept in session pickles instead.
+        def report_failure(future):
+            if future.exception() is not None:
+                logging.error(f"Could not catalogue {file_path}: {future.exception()}")
+
+        future = self.recorder.submit(self.record_file, file_path, mass, channel_sheets)
+        future.add_done_callback(report_failure)
+        return future
+
+    def cache_path_for(self, content_hash, channel):
+        # The descriptor; the columns sit next to it in a .npy file (see store_processed_data)
+        return os.path.join(self.cache_dir, f"{content_hash[:32]}_{channel}.pkl")
+
+    def load_cached_dataset(self, file_path, channel, mass, smoothing_points, validation):
+        # Processed cycle data of an unchanged file, or None if it has to be processed again.
+        # validation is the validation_signature the data must have been cleaned with. Copies
+        # of a file share one dataset, which only serves the mass it was processed with.
+        entry = self.lookup(file_path)
+        if entry is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                '''SELECT cache_path FROM datasets
+                   WHERE content_hash = ? AND channel = ? AND mass = ? AND smoothing_points = ?''',
+                (entry['content_hash'], channel, mass, smoothing_points)).fetchone()
+        if row is None or not row['cache_path'] or not os.path.exists(row['cache_path']):
+            return None
+        cycle_data = load_processed_data(row['cache_path'])
+        if cycle_data.get('validation') != validation:
+            return None
+        cycle_data['filename'] = file_path
+        return cycle_data
+
+    def record_dataset(self, file_path, channel, mass, cycle_data):
+        # Cache the processed dataset and record its cycles. Returns the cache path, or None
+        # if the file is not catalogued.
+        entry = self.lookup(file_path)
+        if entry is None:
+            logging.info(f"{file_path} is not catalogued yet; skipping dataset record")
+            return None
+        content_hash = entry['content_hash']
+
+        cache_path = self.cache_path_for(content_hash, channel)
+        store_processed_data(cycle_data, cache_path)
+
+        # Voltage window and size of every cycle in one pass over the flattened arrays
+        cycle_indices, offsets, arrays = cycle_data_to_arrays(cycle_data, ['Voltage(V)'])
+        voltage = arrays['Voltage(V)']
+        if len(cycle_indices):
+            voltage_min = np.minimum.reduceat(voltage, offsets[:-1])
+            voltage_max = np.maximum.reduceat(voltage, offsets[:-1])
+        else:
+            voltage_min = voltage_max = np.empty(0)
+        rows = [(content_hash, channel, int(cycle_index), float(low), float(high), int(points))
+                for cycle_index, low, high, points in zip(cycle_indices, voltage_min, voltage_max, np.diff(offsets))]
+
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM cycles WHERE content_hash = ? AND channel = ?', (content_hash, channel))
+            self.connection.execute(
+                '''INSERT OR REPLACE INTO datasets (content_hash, channel, cycle_count, mass, smoothing_points,
+                                                    cache_path, processed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (content_hash, channel, len(cycle_indices), mass, cycle_data.get('smoothing_points'), cache_path,
+                 time.time()))
+            self.connection.executemany('INSERT INTO cycles VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return cache_path
+
+    def query_datasets(self, temperature=None, run=None, min_cycles=None, max_cycles=None, channel=None):
+        # File infos (path, mass, channel) for matching datasets, ready to graph without
+        # opening the workbooks. Example: query_datasets(temperature=25, min_cycles=100)
+        clauses, params = [], []
+        if temperature is not None:
+            clauses.append('files.temperature_c = ?')
+            params.append(temperature_celsius(temperature))
+        if run is not None:
+            clauses.append('files.run = ?')
+            params.append(run if str(run).startswith('Run') else f"Run {run}")
+        if min_cycles is not None:
+            clauses.append('datasets.cycle_count >= ?')
+            params.append(int(min_cycles))
+        if max_cycles is not None:
+            clauses.append('datasets.cycle_count <= ?')
+            params.append(int(max_cycles))
+        if channel is not None:
+            clauses.append('datasets.channel = ?')
+            params.append(channel)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        with self.lock:
+            rows = self.connection.execute(
+                f'''SELECT files.path, files.mass, files.temperature, files.run, files.channel_sheets,
+                           datasets.channel, datasets.cycle_count, datasets.cache_path
+                    FROM datasets JOIN files ON files.content_hash = datasets.content_hash
+                    {where}
+                    ORDER BY files.temperature_c, files.run, files.path, datasets.channel''', params).fetchall()
+
+        return [{
+            'path': row['path'],
+            'mass': row['mass'],
+            'channel': row['channel'],
+            'channel_label': row['channel'] if len(json.loads(row['channel_sheets'])) > 1 else None,
+            'temperature': row['temperature'],
+            'run': row['run'],
+            'cycle_count': row['cycle_count'],
+            'cache_path': row['cache_path'],
+        } for row in rows]
+
+    def cycle_ranges(self, file_path, channel):
+        entry = self.lookup(file_path)
+        if entry is None:
+            return []
+        with self.lock:
+            rows = self.connection.execute(
+                '''SELECT cycle_index, voltage_min, voltage_max, points FROM cycles
+                   WHERE content_hash = ? AND channel = ? ORDER BY cycle_index''',
+                (entry['content_hash'], channel)).fetchall()
+        return [dict(row) for row in rows]
@@ -6,6 +6,16 @@ def generate_gradient_colors(start_color, end_color, num_colors):
     end = Color(end_color)
     return [color.hex for color in start.range_to(end, num_colors)]
 
+def resolve_palette_colors(palettes, palette, num_colors, start_color=None, end_color=None):
+    # Same rules as the GUI: gradient_* and Custom palettes are spread over num_colors,
+    # fixed palettes are used as listed
+    if palette.lower() == 'custom':
+        return generate_gradient_colors(start_color, end_color, num_colors)
+    colors = palettes[palette].split(',')
+    if palette.lower().startswith('gradient'):
+        return generate_gradient_colors(colors[0], colors[1], num_colors)
+    return colors
+
 if __name__ == "__main__":
     import argparse
 
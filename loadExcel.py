@@ -1,10 +1,19 @@
 import pandas as pd
+import os
 import re
+import glob
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from readerBackends import open_workbook, normalize_channel_columns
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+DEFAULT_CHANNEL_WORKERS = 4
+# Starting a worker costs about a second, which only pays off for large exports
+CHANNEL_POOL_MIN_BYTES = 20 * 1024 * 1024
+
 def parse_temperature_from_filename(file_path):
     match = re.search(r'(\d+)[C|c]', file_path)
     if match:
@@ -13,6 +22,104 @@ def parse_temperature_from_filename(file_path):
         temperature = 'Unknown'
     return temperature
 
+CHANNEL_SHEET_PATTERN = re.compile(r'^(Channel_\d+)_(\d+)$')
+
+def channel_group_name(sheet):
+    # 'Channel_4_1', 'Channel_4_2', ... are continuation sheets of the same channel
+    match = CHANNEL_SHEET_PATTERN.match(sheet)
+    return match.group(1) if match else sheet
+
+def channel_sheet_part(sheet):
+    match = CHANNEL_SHEET_PATTERN.match(sheet)
+    return int(match.group(2)) if match else 0
+
+def find_channel_groups(sheet_names):
+    # Channel name -> its sheets in continuation order, channels in workbook order
+    groups = {}
+    for sheet in sheet_names:
+        if 'Channel_' in sheet:
+            groups.setdefault(channel_group_name(sheet), []).append(sheet)
+    for sheets in groups.values():
+        sheets.sort(key=channel_sheet_part)
+    return groups
+
+def find_channel_sheets(xls):
+    # Every channel in the workbook, in workbook order
+    channel_sheets = list(find_channel_groups(xls.sheet_names))
+    if not channel_sheets:
+        raise ValueError(f"No 'Channel_' sheet found in workbook. Sheets: {xls.sheet_names}")
+    return channel_sheets
+
+def normalize_file_path(file_path):
+    # The one spelling of a file used for file lists, caches and the catalog: absolute,
+    # with the platform's separators, so dialog and catalog paths compare equal on Windows
+    return os.path.normpath(os.path.abspath(file_path))
+
+def find_continuation_files(file_path):
+    # Exports that hit Excel's row limit are split into '<name>_Wb_1.xlsx', '<name>_Wb_2.xlsx', ...
+    match = re.match(r'^(.*_Wb_)(\d+)(\.\w+)$', file_path, re.IGNORECASE)
+    if not match:
+        return [file_path]
+    prefix, _, extension = match.groups()
+    parts = []
+    for candidate in glob.glob(glob.escape(prefix) + '*' + extension):
+        part = re.match(re.escape(prefix) + r'(\d+)' + re.escape(extension) + '$', candidate)
+        if part:
+            parts.append((int(part.group(1)), candidate))
+    if not parts:
+        return [file_path]
+    return [candidate for _, candidate in sorted(parts)]
+
+def valid_cycle_indices(chunk):
+    if 'Cycle_Index' not in chunk.columns:
+        return pd.Series(dtype=float)
+    return pd.to_numeric(chunk['Cycle_Index'], errors='coerce').dropna()
+
+def stitch_cycle_index(chunk, offset):
+    # Shift the numeric cycle indices of a continuation part; anything else is left
+    # as it is for validation to report
+    if offset and 'Cycle_Index' in chunk.columns:
+        cycles = pd.to_numeric(chunk['Cycle_Index'], errors='coerce')
+        chunk['Cycle_Index'] = (cycles + offset).where(cycles.notna(), chunk['Cycle_Index'])
+    return chunk
+
+def iter_channel_chunks(workbooks, channel):
+    # Stream one channel across its continuation sheets and split workbook files,
+    # one sheet at a time, so only a single sheet is ever held in memory.
+    # A continuation sheet whose Cycle_Index restarts at the channel's first cycle is
+    # shifted so that it continues the last cycle, since split points fall inside a cycle.
+    # Only sheet and file boundaries are stitched; a decrease anywhere else is left for
+    # validate_channel_data to report.
+    first_cycle = last_cycle = None
+    offset = 0
+    for xls in workbooks:
+        sheets = find_channel_groups(xls.sheet_names).get(channel)
+        if not sheets:
+            # Only the channels that overflowed continue into later split files
+            logging.info(f"Channel {channel} has no sheets in this continuation workbook")
+            continue
+        for sheet in sheets:
+            logging.info(f"Loading sheet: {sheet}")
+            # Backends that can stream a sheet (CSV) hand it over in row chunks
+            sheet_chunks = xls.iter_chunks(sheet) if hasattr(xls, 'iter_chunks') else [xls.parse(sheet_name=sheet)]
+            sheet_start = True
+            for chunk in sheet_chunks:
+                chunk = normalize_channel_columns(chunk)
+                logging.info(f"Channel data loaded from {sheet}: {chunk.shape}")
+                cycles = valid_cycle_indices(chunk)
+                if not cycles.empty:
+                    if first_cycle is None:
+                        first_cycle = cycles.iloc[0]
+                    elif sheet_start and cycles.iloc[0] == first_cycle and last_cycle > first_cycle:
+                        offset = last_cycle - first_cycle
+                        logging.info(f"Cycle_Index restarts in {sheet}; offsetting continuation by {offset}")
+                    sheet_start = False
+                    last_cycle = cycles.iloc[-1] + offset
+                yield stitch_cycle_index(chunk, offset)
+
+def concat_channel_chunks(channel, chunks):
+    return pd.concat(list(chunks), ignore_index=True)
+
 def find_channel_sheet(xls):
     try:
         # Check if 'Channel_4_1' exists in the sheet names
@@ -25,24 +132,7 @@ def find_channel_sheet(xls):
         logging.error(f"Error finding channel sheet: {str(e)}")
         raise
 
-def load_excel_data(file_path):
-    logging.info(f"Loading Excel file: {file_path}")
-    xls = pd.ExcelFile(file_path)
-    
-    # Dynamically determine the channel sheet name
-    channel_sheet = find_channel_sheet(xls)
-    logging.info(f"Loading sheet: {channel_sheet}")
-    channel_data = pd.read_excel(xls, sheet_name=channel_sheet)
-    logging.info(f"Channel data loaded: {channel_data.shape}")
-    
-    global_info_sheet = xls.sheet_names[0]
-    logging.info(f"Loading sheet: {global_info_sheet}")
-    global_info = pd.read_excel(xls, sheet_name=global_info_sheet, header=None)
-    logging.info(f"Global_Info data loaded: {global_info.shape}")
-    
-    # Debug: Print the full contents of the global_info DataFrame
-    logging.debug("Global_Info sheet full contents:\n" + global_info.to_string())
-    
+def extract_mass(global_info):
     try:
         # Directly access specific cells H4 and H5
         mass_value = global_info.iloc[4, 7]  # Cell H5 (5th row, 8th column)
@@ -52,9 +142,101 @@ def load_excel_data(file_path):
             raise ValueError(f"Mass value in H5 is not numeric: {mass_value}")
     except IndexError as e:
         raise ValueError("Global_Info sheet does not have enough rows or columns to extract mass. Error: " + str(e))
+    return mass_value
+
+def load_global_info(xls):
+    global_info_sheet = xls.sheet_names[0]
+    logging.info(f"Loading sheet: {global_info_sheet}")
+    global_info = xls.parse(sheet_name=global_info_sheet, header=None)
+    logging.info(f"Global_Info data loaded: {global_info.shape}")
     
+    # Debug: Print the full contents of the global_info DataFrame
+    logging.debug("Global_Info sheet full contents:\n" + global_info.to_string())
+    return global_info
+
+def read_mass(xls):
+    # CSV exports have no Global_Info sheet; the caller has to supply the mass
+    if not getattr(xls, 'has_global_info', True):
+        logging.info("Workbook has no Global_Info sheet; mass must be entered manually")
+        return None
+    return extract_mass(load_global_info(xls))
+
+def load_excel_metadata(file_path, backend='auto'):
+    # Mass, channels and temperature without parsing any channel data
+    logging.info(f"Reading workbook metadata: {file_path}")
+    with open_workbook(file_path, backend) as xls:
+        channel_sheets = find_channel_sheets(xls)
+        mass_value = read_mass(xls)
+    temperature = parse_temperature_from_filename(file_path)
+    return mass_value, channel_sheets, temperature
+
+def consume_workbook_channels(file_path, channels, consume_channel, backend='auto'):
+    # Worker side of load_excel_channels: open the workbook in this process and consume
+    # the given channels, one after another
+    workbooks = [open_workbook(part_path, backend) for part_path in find_continuation_files(file_path)]
+    try:
+        return {channel: consume_channel(channel, iter_channel_chunks(workbooks, channel)) for channel in channels}
+    finally:
+        for xls in workbooks:
+            xls.close()
+
+def load_excel_channels(file_path, channels=None, consume_channel=concat_channel_chunks, backend='auto', max_workers=1):
+    # Open the workbook and its split continuation files once, then hand each channel's
+    # stitched chunk stream to consume_channel(channel, chunks). All channels share the
+    # Global_Info metadata of the first workbook.
+    # Reader engines hold the GIL while parsing, so channels are parsed concurrently in
+    # up to max_workers processes, each with its own workbook handle reading distinct
+    # channels. consume_channel must then be picklable (a module-level function or a
+    # functools.partial of one). Small exports are read in-process, one channel after another.
+    part_paths = find_continuation_files(file_path)
+    logging.info(f"Loading Excel file: {file_path} ({len(part_paths)} part(s))")
+    workbooks = [open_workbook(part_path, backend) for part_path in part_paths]
+    channel_frames = None
+    try:
+        available = find_channel_sheets(workbooks[0])
+        if channels is None:
+            channels = available
+        missing = [channel for channel in channels if channel not in available]
+        if missing:
+            raise ValueError(f"Channel(s) {missing} not found in {file_path}. Available: {available}")
+
+        mass_value = read_mass(workbooks[0])
+        workers = min(max_workers, len(channels), os.cpu_count() or 1)
+        if workers < 2 or sum(os.path.getsize(part_path) for part_path in part_paths) < CHANNEL_POOL_MIN_BYTES:
+            channel_frames = {channel: consume_channel(channel, iter_channel_chunks(workbooks, channel))
+                              for channel in channels}
+    finally:
+        for xls in workbooks:
+            xls.close()
+
+    if channel_frames is None:
+        logging.info(f"Parsing {len(channels)} channels in {workers} worker processes")
+        # Spawned rather than forked, since callers may run Tk or other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(consume_workbook_channels, file_path, channels[worker::workers],
+                                       consume_channel, backend) for worker in range(workers)]
+            results = {}
+            for future in futures:
+                results.update(future.result())
+        channel_frames = {channel: results[channel] for channel in channels}
+
     temperature = parse_temperature_from_filename(file_path)
     logging.info(f"Temperature extracted: {temperature}")
+    return channel_frames, mass_value, temperature
+
+def load_excel_data(file_path, backend='auto'):
+    logging.info(f"Loading Excel file: {file_path}")
+    xls = open_workbook(file_path, backend)
+    
+    # Dynamically determine the channel sheet name
+    channel_sheet = find_channel_sheet(xls)
+    channel = channel_group_name(channel_sheet)
+    xls.close()
+
+    # Include continuation sheets and split files so later cycles are not dropped
+    channel_frames, mass_value, temperature = load_excel_channels(file_path, [channel], backend=backend)
+    channel_data = channel_frames[channel]
+    logging.info(f"Channel data loaded: {channel_data.shape}")
 
     # Add debug statement to log the first few rows of channel_data DataFrame
     logging.debug("Channel data sample:\n" + channel_data.head().to_string())
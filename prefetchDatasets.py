@@ -0,0 +1,118 @@
+import time
+import queue
+import logging
+import itertools
+import threading
+from cycleDatasets import LoadCancelled
+from validateData import validation_signature
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_PREFETCH_WORKERS = 2
+DEFAULT_SHUTDOWN_TIMEOUT = 10
+
+def dataset_key(info, smoothing_points, validation=None):
+    return (info['path'], info.get('channel'), info['mass'], smoothing_points,
+            validation_signature(**(validation or {})))
+
+class DatasetPrefetcher:
+    # Loads and processes datasets on a few background threads while the user is still
+    # choosing graph settings. The most recently added workbooks are processed first, and
+    # work for files that were removed, or for an outdated smoothing setting, is dropped
+    # at the next sheet boundary. Workers never touch tkinter; results are handed over
+    # through take() on the GUI thread.
+    def __init__(self, load, max_workers=DEFAULT_PREFETCH_WORKERS):
+        # load(infos, smoothing_points, validation, cancelled) -> cycle data for each info
+        self.load = load
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        self.wanted = set()
+        self.queued = set()
+        self.running = {}
+        self.results = {}
+        for _ in range(max_workers):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def prefetch(self, infos, smoothing_points, validation=None):
+        # Make infos at these settings the only wanted datasets and queue what is missing
+        keys = [dataset_key(info, smoothing_points, validation) for info in infos]
+        workbooks = {}
+        for info, key in zip(infos, keys):
+            workbooks.setdefault(info['path'], []).append((info, key))
+
+        with self.lock:
+            self.wanted = set(keys)
+            for key in list(self.results):
+                if key not in self.wanted:
+                    del self.results[key]
+            # Later workbooks get a lower sort value, so the newest additions run first
+            for entries in workbooks.values():
+                todo = [(info, key) for info, key in entries
+                        if key not in self.results and key not in self.queued and key not in self.running]
+                if todo:
+                    self.queued.update(key for _, key in todo)
+                    self.queue.put((-next(self.order), [info for info, _ in todo], smoothing_points, validation))
+
+    def shutdown(self, timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+        # Cancel everything and wait for loads already running to stop at their next sheet
+        # boundary, so none of them writes a pickle or touches the catalog afterwards.
+        # Returns False if some load was still running when the timeout ran out.
+        with self.lock:
+            self.wanted.clear()
+            self.results.clear()
+            events = set(self.running.values())
+        deadline = time.monotonic() + timeout
+        for event in events:
+            if not event.wait(max(deadline - time.monotonic(), 0)):
+                return False
+        return True
+
+    def take(self, infos, smoothing_points, validation=None):
+        # Prefetched cycle data for each info, or None where the caller has to load it.
+        # Datasets being processed right now are waited for; queued ones are left to the
+        # caller. Results are handed over once, since callers may modify them.
+        keys = [dataset_key(info, smoothing_points, validation) for info in infos]
+        with self.lock:
+            events = {self.running[key] for key in keys if key in self.running}
+            self.wanted.difference_update(key for key in keys if key in self.queued)
+        for event in events:
+            event.wait()
+        with self.lock:
+            return [self.results.pop(key, None) for key in keys]
+
+    def work(self):
+        while True:
+            _, infos, smoothing_points, validation = self.queue.get()
+            entries = [(info, dataset_key(info, smoothing_points, validation)) for info in infos]
+            with self.lock:
+                self.queued.difference_update(key for _, key in entries)
+                entries = [(info, key) for info, key in entries if key in self.wanted]
+                if not entries:
+                    continue
+                done = threading.Event()
+                for _, key in entries:
+                    self.running[key] = done
+
+            keys = [key for _, key in entries]
+            file_path = entries[0][0]['path']
+            try:
+                datasets = self.load([info for info, _ in entries], smoothing_points, validation,
+                                     lambda: not any(key in self.wanted for key in keys))
+            except LoadCancelled:
+                logging.info(f"Prefetch of {file_path} cancelled")
+            except Exception as e:
+                # The foreground load repeats the work and reports the error to the user
+                logging.warning(f"Prefetch of {file_path} failed: {str(e)}")
+            else:
+                with self.lock:
+                    for key, cycle_data in zip(keys, datasets):
+                        if key in self.wanted:
+                            self.results[key] = cycle_data
+                logging.info(f"Prefetched {len(keys)} dataset(s) from {file_path}")
+            finally:
+                with self.lock:
+                    for key in keys:
+                        self.running.pop(key, None)
+                done.set()
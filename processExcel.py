@@ -1,25 +1,84 @@
 import pandas as pd
+import numpy as np
 import logging
 import pickle
 import os
+import uuid
+import threading
 from scipy.signal import savgol_filter
+from validateData import validate_channel_data, validation_signature, merge_reports, DataValidationError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+PROCESSED_COLUMNS = [
+    'Voltage(V)',
+    'Current(A)',
+    'Current (mA)',
+    'Current Density (mA g^-1)',
+    'Smoothed Current (mA)',
+    'Smoothed Current Density (mA g^-1)',
+]
+# Elapsed test time, kept alongside the processed columns when the export records it
+TIME_COLUMN = 'Test_Time(s)'
+
 def store_processed_data(cycle_data, filename):
-    with open(filename, 'wb') as file:
-        pickle.dump(cycle_data, file)
+    # The processed columns go to a .npy block next to filename, which itself only holds
+    # the small layout descriptor (see cycle_data_layout). Every write gets a fresh data
+    # file, so datasets still memory-mapped from an earlier write stay valid.
+    arrays, descriptor = cycle_data_layout(cycle_data)
+    data_path = f"{os.path.splitext(filename)[0]}_{uuid.uuid4().hex[:12]}.npy"
+    block = np.empty(descriptor['shape'], dtype=np.float64)
+    fill_cycle_block(block, arrays, descriptor)
+    np.save(data_path, block)
+    descriptor['data_file'] = os.path.basename(data_path)
+
+    previous = load_processed_descriptor(filename) if os.path.exists(filename) else None
+    # Written under a per-thread name and moved into place, so readers never see half a descriptor
+    temporary_path = f"{filename}.{threading.get_ident()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(descriptor, file)
+    os.replace(temporary_path, filename)
+    if previous is not None:
+        remove_data_file(filename, previous)
     logging.info(f"Cycle data stored successfully in '{filename}'.")
 
+def load_processed_descriptor(filename):
+    with open(filename, 'rb') as file:
+        descriptor = pickle.load(file)
+    # Files written before the columns moved to .npy blocks hold the whole cycle_data instead
+    return descriptor if 'data_file' in descriptor else None
+
 def load_processed_data(filename):
-    if os.path.exists(filename):
-        with open(filename, 'rb') as file:
-            cycle_data = pickle.load(file)
-        logging.info(f"Cycle data loaded successfully from '{filename}'.")
-        return cycle_data
-    else:
+    # Cycle data whose columns are read-only views into the memory-mapped data file
+    if not os.path.exists(filename):
         raise FileNotFoundError(f"The file '{filename}' does not exist.")
+    descriptor = load_processed_descriptor(filename)
+    if descriptor is None:
+        raise ValueError(f"'{filename}' was written in an older format; process the data again.")
+    block = np.load(os.path.join(os.path.dirname(filename), descriptor['data_file']), mmap_mode='r')
+    logging.info(f"Cycle data loaded successfully from '{filename}'.")
+    return cycle_data_from_block(block, descriptor)
+
+def remove_data_file(filename, descriptor):
+    data_path = os.path.join(os.path.dirname(filename), descriptor['data_file'])
+    try:
+        os.remove(data_path)
+    except OSError as e:
+        # Windows keeps files open while they are memory-mapped
+        logging.warning(f"Could not delete {data_path}: {str(e)}")
+
+def remove_processed_data(filename):
+    # Delete a stored dataset: the descriptor and the data file it points to
+    if not os.path.exists(filename):
+        return
+    try:
+        descriptor = load_processed_descriptor(filename)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        descriptor = None
+    os.remove(filename)
+    if descriptor is not None:
+        remove_data_file(filename, descriptor)
 
 def smooth_data(data, smoothing_points):
     if smoothing_points <= 0 or len(data) < smoothing_points:
@@ -33,50 +92,130 @@ def smooth_data(data, smoothing_points):
     smoothed_data = savgol_filter(data, smoothing_points, polyorder=3)  # You can adjust polyorder as needed
     return smoothed_data.tolist()
 
-def process_data(channel_data, mass, smoothing_points, filename):
+def cycle_data_to_arrays(cycle_data, columns, cycle_list=None):
+    # Flatten the per-cycle lists into contiguous arrays plus cycle offsets so that
+    # later stages can work on every cycle at once instead of looping over cycles
+    cycle_indices = sorted(key for key in cycle_data if isinstance(key, int))
+    if cycle_list is not None:
+        wanted = set(cycle_list)
+        cycle_indices = [cycle_index for cycle_index in cycle_indices if cycle_index in wanted]
+    # Empty cycles would break the segment reductions downstream
+    cycle_indices = [cycle_index for cycle_index in cycle_indices if len(cycle_data[cycle_index][columns[0]]) > 0]
+
+    lengths = np.array([len(cycle_data[cycle_index][columns[0]]) for cycle_index in cycle_indices], dtype=np.int64)
+    offsets = np.zeros(len(cycle_indices) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+
+    arrays = {}
+    for column in columns:
+        if cycle_indices:
+            arrays[column] = np.concatenate([np.asarray(cycle_data[cycle_index][column], dtype=np.float64)
+                                             for cycle_index in cycle_indices])
+        else:
+            arrays[column] = np.empty(0, dtype=np.float64)
+
+    return np.array(cycle_indices, dtype=np.int64), offsets, arrays
+
+def processed_columns(cycle_data):
+    # PROCESSED_COLUMNS, plus the test time for datasets that have it
+    first_cycle = next((cycle_data[key] for key in cycle_data if isinstance(key, int)), {})
+    return PROCESSED_COLUMNS + [TIME_COLUMN] if TIME_COLUMN in first_cycle else PROCESSED_COLUMNS
+
+def cycle_data_layout(cycle_data, columns=None):
+    # The flattened columns of cycle_data and a small picklable descriptor of how they
+    # are laid out in one (columns x samples) float64 block with per-cycle offsets.
+    # Shared memory handoff and stored datasets both use this layout.
+    columns = columns or processed_columns(cycle_data)
+    cycle_indices, offsets, arrays = cycle_data_to_arrays(cycle_data, columns)
+    descriptor = {
+        'dtype': 'float64',
+        'shape': (len(columns), int(offsets[-1])),
+        'columns': list(columns),
+        'cycle_indices': cycle_indices.tolist(),
+        'offsets': offsets.tolist(),
+        # smoothing_points, filename and other small non-cycle entries
+        'metadata': {key: value for key, value in cycle_data.items() if not isinstance(key, int)},
+    }
+    return arrays, descriptor
+
+def fill_cycle_block(block, arrays, descriptor):
+    for row, column in enumerate(descriptor['columns']):
+        block[row] = arrays[column]
+
+def cycle_data_from_block(block, descriptor):
+    # Rebuild a cycle_data dict whose columns are zero-copy views into block
+    offsets = descriptor['offsets']
+    cycle_data = dict(descriptor['metadata'])
+    for position, cycle_index in enumerate(descriptor['cycle_indices']):
+        start, stop = offsets[position], offsets[position + 1]
+        cycle_data[cycle_index] = {column: block[row, start:stop] for row, column in enumerate(descriptor['columns'])}
+    return cycle_data
+
+def process_data(channel_data, mass, smoothing_points, filename, bad_row_policy='fail', voltage_range=None):
     logging.info("Processing channel data...")
 
     cycle_data = {}
-
-    # Check if 'Cycle_Index' exists in the DataFrame
-    if 'Cycle_Index' not in channel_data.columns:
-        raise KeyError("The required column 'Cycle_Index' is missing from the data.")
-
-    for i, row in channel_data.iterrows():
-        # Ensure 'Cycle_Index' is correctly extracted
-        try:
-            cycle_index = int(row['Cycle_Index'])  # Ensure Cycle_Index is an integer
-        except ValueError:
-            raise ValueError(f"Invalid Cycle_Index value at row {i}: {row['Cycle_Index']}")
-
-        # Initialize the dictionary for this cycle_index if it doesn't exist
-        if cycle_index not in cycle_data:
-            cycle_data[cycle_index] = {
-                'Voltage(V)': [],
-                'Current(A)': [],
-                'Current (mA)': [],
-                'Current Density (mA g^-1)': [],
-                'Smoothed Current (mA)': [],
-                'Smoothed Current Density (mA g^-1)': []
-            }
-
-        # Extract relevant data
-        voltage = row.get('Voltage(V)')
-        current = row.get('Current(A)')
-
-        # Ensure that voltage and current are not missing
-        if pd.isnull(voltage) or pd.isnull(current):
-            raise ValueError(f"Missing data on row {i}: Voltage or Current")
+    report = {}
+
+    # Accept either a single DataFrame or a stream of chunks (continuation sheets),
+    # so large channels never have to be concatenated in memory
+    chunks = [channel_data] if isinstance(channel_data, pd.DataFrame) else channel_data
+    row_offset = 0
+    last_cycle = None
+    keep_time = None
+
+    for chunk in chunks:
+        # Exports that record the test time keep it, so charge can be integrated over real time
+        if keep_time is None:
+            keep_time = TIME_COLUMN in chunk.columns
+
+        # Validate the whole chunk before splitting it into cycles. Every bad row range is
+        # collected, so a failure reports all of them rather than just the first one.
+        chunk_rows = len(chunk)
+        chunk, chunk_report, last_cycle = validate_channel_data(
+            chunk, bad_row_policy, voltage_range, row_offset, last_cycle)
+        merge_reports(report, chunk_report)
+        row_offset += chunk_rows
+        if report and bad_row_policy == 'fail':
+            continue
+
+        cycles = chunk['Cycle_Index'].to_numpy(dtype=np.int64)
+        voltage = chunk['Voltage(V)'].to_numpy(dtype=np.float64)
+        current = chunk['Current(A)'].to_numpy(dtype=np.float64)
+        if keep_time:
+            test_time = (pd.to_numeric(chunk[TIME_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+                         if TIME_COLUMN in chunk.columns else np.full(len(chunk), np.nan))
 
         # Convert current to mA and calculate current density
         current_ma = current * 1000
         current_density = current_ma / mass
 
-        # Append extracted values to the respective lists
-        cycle_data[cycle_index]['Voltage(V)'].append(voltage)
-        cycle_data[cycle_index]['Current(A)'].append(current)
-        cycle_data[cycle_index]['Current (mA)'].append(current_ma)
-        cycle_data[cycle_index]['Current Density (mA g^-1)'].append(current_density)
+        # Split the chunk into cycles with one stable sort instead of a pass per row
+        order = np.argsort(cycles, kind='stable')
+        cycle_indices, starts = np.unique(cycles[order], return_index=True)
+        for cycle_index, rows in zip(cycle_indices.tolist(), np.split(order, starts[1:])):
+            # Initialize the dictionary for this cycle_index if it doesn't exist
+            if cycle_index not in cycle_data:
+                cycle_data[cycle_index] = {
+                    'Voltage(V)': [],
+                    'Current(A)': [],
+                    'Current (mA)': [],
+                    'Current Density (mA g^-1)': [],
+                    'Smoothed Current (mA)': [],
+                    'Smoothed Current Density (mA g^-1)': []
+                }
+                if keep_time:
+                    cycle_data[cycle_index][TIME_COLUMN] = []
+
+            cycle_data[cycle_index]['Voltage(V)'].extend(voltage[rows].tolist())
+            cycle_data[cycle_index]['Current(A)'].extend(current[rows].tolist())
+            cycle_data[cycle_index]['Current (mA)'].extend(current_ma[rows].tolist())
+            cycle_data[cycle_index]['Current Density (mA g^-1)'].extend(current_density[rows].tolist())
+            if keep_time:
+                cycle_data[cycle_index][TIME_COLUMN].extend(test_time[rows].tolist())
+
+    if report and bad_row_policy == 'fail':
+        raise DataValidationError(report)
 
     # Apply smoothing after all data has been collected
     for cycle_index in cycle_data:
@@ -93,6 +232,9 @@ def process_data(channel_data, mass, smoothing_points, filename):
     # Store the filename
     cycle_data['filename'] = filename
 
+    # Store the bad row settings the data was cleaned with, so caches can tell it apart
+    cycle_data['validation'] = validation_signature(bad_row_policy, voltage_range)
+
     logging.info("Channel data processing complete.")
 
     return cycle_data
@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import logging
+import importlib.util
+import pandas as pd
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CSV_CHUNK_ROWS = 200000
+
+# Arbin software versions disagree on spacing, underscores and case in column names
+CANONICAL_COLUMNS = {
+    'datapoint': 'Data_Point',
+    'testtime(s)': 'Test_Time(s)',
+    'datetime': 'Date_Time',
+    'steptime(s)': 'Step_Time(s)',
+    'stepindex': 'Step_Index',
+    'cycleindex': 'Cycle_Index',
+    'current(a)': 'Current(A)',
+    'voltage(v)': 'Voltage(V)',
+}
+
+def normalize_channel_columns(channel_data):
+    renames = {}
+    for column in channel_data.columns:
+        key = re.sub(r'[\s_]', '', str(column)).lower()
+        canonical = CANONICAL_COLUMNS.get(key)
+        if canonical and canonical != column:
+            renames[column] = canonical
+    return channel_data.rename(columns=renames) if renames else channel_data
+
+class ReaderBackend:
+    name = None
+    extensions = ()
+
+    def is_available(self):
+        return True
+
+    def open(self, file_path):
+        raise NotImplementedError
+
+class ExcelEngineBackend(ReaderBackend):
+    engine = None
+    module = None
+
+    def is_available(self):
+        return importlib.util.find_spec(self.module) is not None
+
+    def open(self, file_path):
+        return pd.ExcelFile(file_path, engine=self.engine)
+
+class CalamineBackend(ExcelEngineBackend):
+    # Rust-based reader, much faster than openpyxl on large sheets (pandas >= 2.2)
+    name = 'calamine'
+    engine = 'calamine'
+    module = 'python_calamine'
+    extensions = ('.xlsx', '.xlsm', '.xlsb', '.xls', '.ods')
+
+    def is_available(self):
+        return super().is_available() and 'calamine' in getattr(pd.ExcelFile, '_engines', {})
+
+class OpenpyxlBackend(ExcelEngineBackend):
+    # pandas opens workbooks with openpyxl in read-only, values-only mode
+    name = 'openpyxl'
+    engine = 'openpyxl'
+    module = 'openpyxl'
+    extensions = ('.xlsx', '.xlsm')
+
+class ArbinCsvWorkbook:
+    # Presents a CSV/TSV channel export with the same interface as pd.ExcelFile.
+    # These exports carry no Global_Info sheet, so the mass has to come from elsewhere.
+    has_global_info = False
+
+    def __init__(self, file_path, sep, chunk_rows=CSV_CHUNK_ROWS):
+        self.file_path = file_path
+        self.sep = sep
+        self.chunk_rows = chunk_rows
+        match = re.search(r'Channel_?(\d+)', os.path.basename(file_path), re.IGNORECASE)
+        self.sheet_names = [f"Channel_{match.group(1) if match else 1}_1"]
+
+    def parse(self, sheet_name=0, header=0):
+        return pd.read_csv(self.file_path, sep=self.sep, header=header)
+
+    def iter_chunks(self, sheet_name):
+        with pd.read_csv(self.file_path, sep=self.sep, chunksize=self.chunk_rows) as reader:
+            yield from reader
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ArbinCsvBackend(ReaderBackend):
+    name = 'arbin_csv'
+    extensions = ('.csv', '.tsv', '.txt')
+
+    def open(self, file_path):
+        sep = ',' if file_path.lower().endswith('.csv') else '\t'
+        return ArbinCsvWorkbook(file_path, sep)
+
+BACKENDS = {backend.name: backend for backend in (CalamineBackend(), OpenpyxlBackend(), ArbinCsvBackend())}
+
+def candidate_backends(file_path, backend='auto'):
+    # Requested backend first, then every other backend that can read this file type
+    extension = os.path.splitext(file_path)[1].lower()
+    names = [name for name, candidate in BACKENDS.items() if extension in candidate.extensions]
+    if backend and backend != 'auto':
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown reader backend '{backend}'. Choose from: auto, {', '.join(BACKENDS)}")
+        # A configured Excel backend does not apply to CSV files and vice versa
+        if backend in names:
+            names = [backend] + [name for name in names if name != backend]
+    return names
+
+def open_workbook(file_path, backend='auto'):
+    errors = []
+    names = candidate_backends(file_path, backend)
+    for name in names:
+        candidate = BACKENDS[name]
+        if not candidate.is_available():
+            errors.append(f"{name}: not installed")
+            continue
+        try:
+            workbook = candidate.open(file_path)
+        except ImportError as e:
+            errors.append(f"{name}: {str(e)}")
+            continue
+        if backend in names and backend != name:
+            logging.warning(f"Reader backend '{backend}' unavailable for {file_path}; fell back to '{name}'")
+        logging.info(f"Opened {file_path} with the '{name}' reader backend")
+        return workbook
+    raise ValueError(f"No reader backend can open {file_path}. Tried: {'; '.join(errors) or 'none for this file type'}")
+
+def benchmark_backends(file_path, repeat=3):
+    from loadExcel import load_excel_channels
+
+    results = {}
+    for name in candidate_backends(file_path):
+        if not BACKENDS[name].is_available():
+            logging.info(f"Skipping '{name}': not installed")
+            continue
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            channel_frames, _, _ = load_excel_channels(file_path, backend=name)
+            timings.append(time.perf_counter() - start)
+        rows = sum(len(channel_data) for channel_data in channel_frames.values())
+        results[name] = (min(timings), rows)
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the reader backends on an Arbin export.")
+    parser.add_argument("file_path", type=str, help="Arbin .xlsx or .csv export to read")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed reads per backend (best is reported)")
+
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = benchmark_backends(args.file_path, args.repeat)
+    for name, (seconds, rows) in sorted(results.items(), key=lambda item: item[1][0]):
+        print(f"{name:<10} {seconds:8.3f} s  {rows} rows  {rows / seconds:,.0f} rows/s")
@@ -0,0 +1,390 @@
+import os
+import json
+import base64
+import logging
+import tempfile
+import threading
+import configparser
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import matplotlib
+matplotlib.use('Agg')  # The service renders headless; no GUI backend is needed
+
+from loadExcel import load_excel_metadata, parse_temperature_from_filename, normalize_file_path, DEFAULT_CHANNEL_WORKERS
+from cycleDatasets import load_cycle_datasets, describe_file_info, make_file_infos
+from createCVgraph import create_cv_graph, create_cv_graph_compare, create_cv_heatmap
+from genColors import resolve_palette_colors
+from validateData import validation_settings
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+config_file = 'config.ini'
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_DATASETS = 32
+
+def parse_cycle_range(cycle_range):
+    if isinstance(cycle_range, list):
+        return [int(cycle) for cycle in cycle_range]
+    cycle_list = []
+    if cycle_range:
+        for part in str(cycle_range).split(','):
+            if '-' in part:
+                start, end = part.split('-')
+                cycle_list.extend(range(int(start), int(end) + 1))
+            else:
+                cycle_list.append(int(part))
+    return cycle_list
+
+def graph_params_from_config(config):
+    major_tick_interval = float(config['DEFAULT'].get('majortickinterval', '50'))
+
+    def axis_limit(key):
+        value = config['DEFAULT'][key]
+        return float(value) if value != "auto" else "auto"
+
+    return {
+        "font_family": config['DEFAULT']['fontfamily'],
+        "font_size": int(config['DEFAULT']['fontsize']),
+        "tick_font_size": int(config['DEFAULT']['tickfontsize']),
+        "legend_font_size": int(config['DEFAULT']['legendfontsize']),
+        "x_min": axis_limit('xaxismin'),
+        "x_max": axis_limit('xaxismax'),
+        "y_min": axis_limit('yaxismin'),
+        "y_max": axis_limit('yaxismax'),
+        "show_grid": config['DEFAULT'].getboolean('showgrid'),
+        "output_dir": config['DEFAULT']['outputdirectory'],
+        "filename_template": config['DEFAULT'].get('filenametemplate', '{temperature}_CV-Graph'),
+        "line_weight": float(config['DEFAULT']['lineweight']),
+        "axis_line_weight": float(config['DEFAULT']['axislineweight']),
+        "major_tick_interval": major_tick_interval,
+        "minor_tick_interval": major_tick_interval / 2,
+        "width": float(config['DEFAULT']['width']),
+        "height": float(config['DEFAULT']['height']),
+        "dpi": int(config['DEFAULT']['dpi']),
+        "tick_length": float(config['DEFAULT']['ticklength']),
+        "tick_width": float(config['DEFAULT']['tickwidth']),
+    }
+
+def restrict_graph_params(overrides, output_dir):
+    # Requests may pick a subdirectory of the configured output directory and a plain
+    # file name template, but never write anywhere else the service account can
+    overrides = dict(overrides)
+    root = os.path.realpath(output_dir)
+    if 'output_dir' in overrides:
+        requested = os.path.realpath(os.path.join(root, str(overrides['output_dir'])))
+        if os.path.commonpath([root, requested]) != root:
+            raise ValueError(f"output_dir must be inside the configured output directory {output_dir}")
+        overrides['output_dir'] = requested
+    template = str(overrides.get('filename_template', ''))
+    if not is_plain_name(template):
+        raise ValueError("filename_template must be a plain file name without directories")
+    return overrides
+
+def is_plain_name(name):
+    return '/' not in name and '\\' not in name and '..' not in name
+
+def check_output_name(output_dir, filename_template, temperature):
+    # The file name a graph is saved under once the template is filled in, as
+    # create_unique_filename builds it, must land directly in output_dir
+    root = os.path.realpath(output_dir)
+    output_path = os.path.realpath(os.path.join(root, filename_template.format(temperature=temperature)))
+    if os.path.dirname(output_path) != root:
+        raise ValueError(f"Graph for '{temperature}' would be saved outside the output directory")
+
+class DatasetCache:
+    # Processed cycle data kept resident between requests, evicting the least recently
+    # used dataset once more than max_datasets are held. Entries are keyed on the file's
+    # modification time so edited workbooks are re-ingested.
+    def __init__(self, max_datasets=DEFAULT_MAX_DATASETS, backend='auto', validation=None,
+                 channel_workers=DEFAULT_CHANNEL_WORKERS):
+        self.max_datasets = max_datasets
+        self.backend = backend
+        self.validation = validation
+        self.channel_workers = channel_workers
+        self.datasets = OrderedDict()
+        self.metadata = {}
+        # Futures of datasets being ingested, so concurrent requests for the same key
+        # wait for one load instead of processing the same workbook twice
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def expand_files(self, files):
+        # Accept bare paths or {"path", "mass", "channel", "temperature"} objects
+        infos = []
+        for entry in files:
+            entry = {'path': entry} if isinstance(entry, str) else dict(entry)
+            file_path = entry['path'] = normalize_file_path(entry['path'])
+            # The temperature ends up in the output file name
+            if entry.get('temperature'):
+                entry['temperature'] = str(entry['temperature'])
+                if not is_plain_name(entry['temperature']):
+                    raise ValueError("temperature must not contain path separators or '..'")
+            if 'mass' in entry and 'channel' in entry:
+                infos.append(entry)
+                continue
+
+            key = (file_path, os.path.getmtime(file_path))
+            with self.lock:
+                metadata = self.metadata.get(key)
+            if metadata is None:
+                metadata = load_excel_metadata(file_path, self.backend)
+                with self.lock:
+                    self.metadata[key] = metadata
+            mass, channel_sheets, _ = metadata
+            mass = entry.get('mass', mass)
+            if mass is None:
+                raise ValueError(f"No mass available for {file_path}; pass it as \"mass\" in the request")
+
+            channels = [entry['channel']] if entry.get('channel') else channel_sheets
+            for info in make_file_infos(file_path, mass, channels):
+                if len(channel_sheets) > 1:
+                    info['channel_label'] = info['channel']
+                if entry.get('temperature'):
+                    info['temperature'] = entry['temperature']
+                infos.append(info)
+        return infos
+
+    def dataset_key(self, info, smoothing_points):
+        return (info['path'], info.get('channel'), info['mass'], smoothing_points, os.path.getmtime(info['path']))
+
+    def get(self, infos, smoothing_points):
+        keys = [self.dataset_key(info, smoothing_points) for info in infos]
+        results = [None] * len(infos)
+        owned = {}
+        waiting = {}
+        with self.lock:
+            for position, key in enumerate(keys):
+                if key in self.datasets:
+                    self.datasets.move_to_end(key)
+                    results[position] = self.datasets[key]
+                elif key in self.loading:
+                    waiting[position] = self.loading[key]
+                elif key in owned:
+                    waiting[position] = owned[key]
+                else:
+                    owned[key] = self.loading[key] = Future()
+
+        if owned:
+            positions = [keys.index(key) for key in owned]
+            try:
+                loaded = load_cycle_datasets([infos[position] for position in positions], smoothing_points,
+                                             self.backend, validation=self.validation, session_pickles=False,
+                                             channel_workers=self.channel_workers)
+            except Exception as e:
+                with self.lock:
+                    for key, future in owned.items():
+                        self.loading.pop(key, None)
+                        future.set_exception(e)
+                raise
+            with self.lock:
+                for position, cycle_data in zip(positions, loaded):
+                    self.datasets[keys[position]] = cycle_data
+                    self.loading.pop(keys[position], None)
+                    owned[keys[position]].set_result(cycle_data)
+                    results[position] = cycle_data
+                while len(self.datasets) > self.max_datasets:
+                    evicted, _ = self.datasets.popitem(last=False)
+                    logging.info(f"Evicted cached dataset: {evicted[0]} ({evicted[1]})")
+
+        for position, future in waiting.items():
+            results[position] = future.result()
+
+        logging.info(f"Datasets: {len(infos) - len(owned) - len(waiting)} warm, {len(owned)} loaded, "
+                     f"{len(waiting)} shared with another request")
+        return results
+
+class RenderService:
+    def __init__(self, max_datasets=DEFAULT_MAX_DATASETS, config_path=config_file):
+        self.config = configparser.ConfigParser()
+        self.config.read(config_path)
+        self.cache = DatasetCache(max_datasets, self.config['DEFAULT'].get('readerbackend', 'auto'),
+                                  validation_settings(self.config),
+                                  int(self.config['DEFAULT'].get('channelworkers', DEFAULT_CHANNEL_WORKERS)))
+        # pyplot keeps global figure state, so renders are serialized
+        self.render_lock = threading.Lock()
+
+    def render(self, request, output_dir=None):
+        # Renders into the configured output directory, or into output_dir when the
+        # service itself picks one (render_images)
+        mode = request.get('mode', 'single')
+        if mode not in ('single', 'compare', 'heatmap'):
+            raise ValueError(f"Unknown mode '{mode}'. Use 'single', 'compare' or 'heatmap'")
+        if not request.get('files'):
+            raise ValueError("The request needs at least one entry in \"files\"")
+
+        defaults = self.config['DEFAULT']
+        smoothing_points = int(request.get('smoothing_points', defaults['smoothingpoints']))
+        cycle_list = parse_cycle_range(request.get('cycles', '1-6'))
+        scan_rate = request.get('scan_rate', '0.2')
+        graph_params = graph_params_from_config(self.config)
+        graph_params.update(restrict_graph_params(request.get('graph_params', {}), graph_params['output_dir']))
+        if output_dir is not None:
+            graph_params['output_dir'] = output_dir
+
+        infos = self.cache.expand_files(request['files'])
+        temperatures = [info.get('temperature') or parse_temperature_from_filename(info['path']) for info in infos]
+        if mode == 'compare':
+            check_output_name(graph_params['output_dir'], graph_params['filename_template'], 'Comparison')
+        else:
+            suffix = "_Heatmap" if mode == 'heatmap' else ""
+            for temperature in temperatures:
+                check_output_name(graph_params['output_dir'], graph_params['filename_template'] + suffix, temperature)
+
+        cycle_datasets = self.cache.get(infos, smoothing_points)
+
+        def colors_for(num_colors):
+            if request.get('colors'):
+                return list(request['colors'])
+            palette = request.get('palette', next(iter(self.config['PALETTES'])))
+            return resolve_palette_colors(self.config['PALETTES'], palette, num_colors,
+                                          request.get('start_color'), request.get('end_color'))
+
+        output_paths = []
+        with self.render_lock:
+            if mode in ('single', 'heatmap'):
+                render_graph = create_cv_heatmap if mode == 'heatmap' else create_cv_graph
+                for info, temperature, cycle_data in zip(infos, temperatures, cycle_datasets):
+                    output_paths.append(render_graph(cycle_data, temperature, scan_rate, cycle_list,
+                                                     colors_for(len(cycle_list)), graph_params,
+                                                     describe_file_info(info)))
+            else:
+                cycle_data_dict = {}
+                for info, label, cycle_data in zip(infos, temperatures, cycle_datasets):
+                    run_info = describe_file_info(info)
+                    if run_info:
+                        label = f"{label} - {run_info}"
+                    cycle_data_dict[label] = cycle_data
+                colors = colors_for(len(cycle_data_dict))
+                for cycle_number in cycle_list:
+                    output_paths.extend(create_cv_graph_compare(cycle_data_dict, [cycle_number], scan_rate,
+                                                                colors.copy(), graph_params,
+                                                                bool(request.get('average_replicates'))))
+        return output_paths
+
+    def render_images(self, request):
+        # PNG bytes for every graph; the files only live in a scratch directory for the
+        # length of the request, so repeated renders leave nothing behind
+        with tempfile.TemporaryDirectory(prefix='cv-render-') as scratch:
+            output_paths = self.render(request, scratch)
+            images = []
+            for output_path in output_paths:
+                with open(output_path, 'rb') as file:
+                    images.append(file.read())
+        return images
+
+def make_handler(service):
+    class RenderRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != '/health':
+                self.send_json(404, {'error': f"Unknown path: {self.path}"})
+                return
+            self.send_json(200, {'status': 'ok', 'cached_datasets': len(service.cache.datasets)})
+
+        def do_POST(self):
+            if self.path != '/render':
+                self.send_json(404, {'error': f"Unknown path: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if request.get('response', 'paths') == 'png':
+                    images = service.render_images(request)
+                else:
+                    output_paths = service.render(request)
+            except (ValueError, KeyError, OSError) as e:
+                logging.error(str(e))
+                self.send_json(400, {'error': str(e)})
+                return
+            except Exception as e:
+                logging.exception("Render request failed")
+                self.send_json(500, {'error': str(e)})
+                return
+
+            if request.get('response', 'paths') != 'png':
+                self.send_json(200, {'paths': output_paths})
+            elif len(images) == 1:
+                body = images[0]
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_json(200, {'images': [base64.b64encode(image).decode('ascii') for image in images]})
+
+        def log_message(self, format, *args):
+            logging.info("%s - %s" % (self.address_string(), format % args))
+
+    return RenderRequestHandler
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_datasets=DEFAULT_MAX_DATASETS):
+    service = RenderService(max_datasets)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    logging.info(f"Render service listening on http://{host}:{port} (caching up to {max_datasets} datasets)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def request_render(request, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=600):
+    # Thin client: returns PNG bytes for single-image 'png' responses, otherwise the JSON reply
+    data = json.dumps(request).encode('utf-8')
+    http_request = urllib.request.Request(f"{url}/render", data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        body = response.read()
+        if response.headers.get('Content-Type') == 'image/png':
+            return body
+        return json.loads(body)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local render service that keeps processed CV datasets in memory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Start the render service")
+    serve_parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Interface to listen on")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    serve_parser.add_argument("--max-datasets", type=int, default=DEFAULT_MAX_DATASETS, help="Processed datasets kept in memory")
+
+    render_parser = subparsers.add_parser("render", help="Ask a running service to render graphs")
+    render_parser.add_argument("files", nargs="+", help="Arbin exports to graph")
+    render_parser.add_argument("--url", type=str, default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", help="Service URL")
+    render_parser.add_argument("--cycles", type=str, default="1-6", help="Cycles to graph (e.g., 1-4,6,8)")
+    render_parser.add_argument("--mode", choices=["single", "compare", "heatmap"], default="single", help="Graph mode")
+    render_parser.add_argument("--scan-rate", type=str, default="0.2", help="Scan rate (mV/s)")
+    render_parser.add_argument("--palette", type=str, help="Palette name from config.ini")
+    render_parser.add_argument("--output-dir", type=str, help="Subdirectory of the configured output directory to save graphs to")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.max_datasets)
+    else:
+        request = {
+            'files': [os.path.abspath(file_path) for file_path in args.files],
+            'cycles': args.cycles,
+            'mode': args.mode,
+            'scan_rate': args.scan_rate,
+        }
+        if args.palette:
+            request['palette'] = args.palette
+        if args.output_dir:
+            request['graph_params'] = {'output_dir': args.output_dir}
+        for output_path in request_render(request, args.url)['paths']:
+            print(output_path)
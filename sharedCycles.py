@@ -0,0 +1,134 @@
+import gc
+import os
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from processExcel import cycle_data_layout, fill_cycle_block, cycle_data_from_block
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Spawning workers and attaching costs more than drawing a few small graphs in-process
+RENDER_POOL_MIN_JOBS = 4
+RENDER_POOL_MIN_SAMPLES = 2000000
+
+render_pool = None
+
+def publish_cycle_data(cycle_data):
+    # Copy the processed columns into one shared memory block (see cycle_data_layout).
+    # Returns the segment, which the caller must close and unlink, and a small picklable
+    # descriptor of it.
+    arrays, descriptor = cycle_data_layout(cycle_data)
+    segment = shared_memory.SharedMemory(create=True, size=max(int(np.prod(descriptor['shape'])) * 8, 1))
+    block = np.ndarray(descriptor['shape'], dtype=np.float64, buffer=segment.buf)
+    fill_cycle_block(block, arrays, descriptor)
+    del block
+    descriptor['name'] = segment.name
+    return segment, descriptor
+
+def attach_cycle_data(descriptor):
+    # Rebuild a cycle_data dict whose columns are zero-copy views into the shared block.
+    # The views must be released before the returned segment is closed.
+    segment = shared_memory.SharedMemory(name=descriptor['name'])
+    block = np.ndarray(descriptor['shape'], dtype=descriptor['dtype'], buffer=segment.buf)
+    return segment, cycle_data_from_block(block, descriptor)
+
+def graph_renderers():
+    # Imported lazily so that worker processes can pick a backend before pyplot loads
+    from createCVgraph import create_cv_graph, create_cv_heatmap
+    return {'lines': create_cv_graph, 'heatmap': create_cv_heatmap}
+
+def render_local_jobs(jobs):
+    renderers = graph_renderers()
+    return [renderers[mode](cycle_data, *args) for mode, cycle_data, args in jobs]
+
+def init_render_worker():
+    # Worker processes draw off-screen and pay for the pyplot import once, up front
+    import matplotlib
+    matplotlib.use('Agg')
+    graph_renderers()
+
+def render_shared_jobs(jobs):
+    # Worker side of render_graph_batch: attach each dataset and draw it off-screen
+    renderers = graph_renderers()
+
+    output_paths = []
+    for mode, descriptor, args in jobs:
+        segment, cycle_data = attach_cycle_data(descriptor)
+        try:
+            output_paths.append(renderers[mode](cycle_data, *args))
+        finally:
+            # Figures can keep the views alive until collected, and the segment cannot
+            # be closed while any view still exists
+            del cycle_data
+            gc.collect()
+            segment.close()
+    return output_paths
+
+def get_render_pool(max_workers=None):
+    # One pool for the life of the process. Workers are spawned rather than forked: the
+    # GUI process runs Tk and prefetch threads, which a forked child would inherit in
+    # whatever state they were in (held locks included).
+    global render_pool
+    if render_pool is None:
+        render_pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                          mp_context=multiprocessing.get_context('spawn'),
+                                          initializer=init_render_worker)
+    return render_pool
+
+def shutdown_render_pool():
+    global render_pool
+    if render_pool is not None:
+        render_pool.shutdown(wait=False, cancel_futures=True)
+        render_pool = None
+
+def output_base_name(mode, args):
+    # The file name create_unique_filename starts from. Jobs sharing it must run one
+    # after another in one process, or its exists-then-save check races across workers.
+    temperature, graph_params = args[0], args[4]
+    template = graph_params["filename_template"] + ("_Heatmap" if mode == 'heatmap' else "")
+    return os.path.join(graph_params["output_dir"], template.format(temperature=temperature))
+
+def count_samples(cycle_data):
+    return sum(len(data['Voltage(V)']) for key, data in cycle_data.items() if isinstance(key, int))
+
+def render_graph_batch(jobs, max_workers=None):
+    # Render (mode, cycle_data, args) jobs, where args follow cycle_data in the call to
+    # create_cv_graph or create_cv_heatmap. Large batches are spread over worker processes
+    # that receive only shared memory descriptors, never the sample data itself; small ones
+    # are cheaper to draw in-process. Returns the output paths in job order.
+    groups = {}
+    for position, (mode, _, args) in enumerate(jobs):
+        groups.setdefault(output_base_name(mode, args), []).append(position)
+
+    samples = sum(count_samples(cycle_data) for _, cycle_data, _ in jobs)
+    workers = min(max_workers or os.cpu_count() or 1, len(groups))
+    if workers < 2 or (len(jobs) < RENDER_POOL_MIN_JOBS and samples < RENDER_POOL_MIN_SAMPLES):
+        return render_local_jobs(jobs)
+
+    segments = {}
+    descriptors = {}
+    try:
+        for _, cycle_data, _ in jobs:
+            if id(cycle_data) not in descriptors:
+                segments[id(cycle_data)], descriptors[id(cycle_data)] = publish_cycle_data(cycle_data)
+
+        logging.info(f"Rendering {len(jobs)} graphs ({samples} samples) in worker processes")
+        executor = get_render_pool(max_workers)
+        futures = {
+            executor.submit(render_shared_jobs,
+                            [(jobs[position][0], descriptors[id(jobs[position][1])], jobs[position][2])
+                             for position in positions]): positions
+            for positions in groups.values()
+        }
+        output_paths = [None] * len(jobs)
+        for future, positions in futures.items():
+            for position, output_path in zip(positions, future.result()):
+                output_paths[position] = output_path
+        return output_paths
+    finally:
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
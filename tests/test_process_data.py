@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from processExcel import process_data, smooth_data
+
+def process_data_rowwise(channel_data, mass, smoothing_points, filename):
+    # The original one-row-at-a-time processing, kept as the reference that the
+    # vectorized process_data is checked against (clean data only)
+    cycle_data = {}
+    for _, row in channel_data.iterrows():
+        cycle_index = int(row['Cycle_Index'])
+        if cycle_index not in cycle_data:
+            cycle_data[cycle_index] = {column: [] for column in ('Voltage(V)', 'Current(A)', 'Current (mA)',
+                                                                   'Current Density (mA g^-1)')}
+        voltage = row.get('Voltage(V)')
+        current = row.get('Current(A)')
+        if pd.isnull(voltage) or pd.isnull(current):
+            raise ValueError("Missing data on row: Voltage or Current")
+        cycle_data[cycle_index]['Voltage(V)'].append(voltage)
+        cycle_data[cycle_index]['Current(A)'].append(current)
+        cycle_data[cycle_index]['Current (mA)'].append(current * 1000)
+        cycle_data[cycle_index]['Current Density (mA g^-1)'].append(current * 1000 / mass)
+
+    for cycle_index in cycle_data:
+        cycle_data[cycle_index]['Smoothed Current (mA)'] = smooth_data(cycle_data[cycle_index]['Current (mA)'], smoothing_points)
+        cycle_data[cycle_index]['Smoothed Current Density (mA g^-1)'] = smooth_data(cycle_data[cycle_index]['Current Density (mA g^-1)'], smoothing_points)
+    cycle_data['smoothing_points'] = smoothing_points
+    cycle_data['filename'] = filename
+    return cycle_data
+
+def synthetic_channel_data(rows=50000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Cycle_Index': np.repeat(np.arange(1, 11), rows // 10),
+        'Voltage(V)': np.tile(np.concatenate([np.linspace(0.3, 1.6, rows // 20), np.linspace(1.6, 0.3, rows // 20)]), 10),
+        'Current(A)': rng.normal(0, 1e-3, rows),
+    })
+
+@pytest.mark.parametrize('chunk_rows', [None, 4096, 7919])
+def test_process_data_matches_rowwise_reference(chunk_rows):
+    channel_data = synthetic_channel_data()
+    if chunk_rows:
+        # Chunks exercise the streaming path, with cycles split across chunk boundaries
+        chunks = [channel_data.iloc[start:start + chunk_rows] for start in range(0, len(channel_data), chunk_rows)]
+    else:
+        chunks = channel_data
+    vectorized = process_data(chunks, 0.01, 15, 'check')
+    reference = process_data_rowwise(channel_data, 0.01, 15, 'check')
+
+    reference_cycles = sorted(key for key in reference if isinstance(key, int))
+    assert sorted(key for key in vectorized if isinstance(key, int)) == reference_cycles
+    for cycle_index in reference_cycles:
+        for column, expected in reference[cycle_index].items():
+            actual = vectorized[cycle_index][column]
+            assert len(actual) == len(expected), f"Cycle {cycle_index}, {column}"
+            np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=0, err_msg=f"Cycle {cycle_index}, {column}")
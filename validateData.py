@@ -0,0 +1,127 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BAD_ROW_POLICIES = ('fail', 'drop', 'interpolate')
+MAX_RANGES_SHOWN = 10
+
+class DataValidationError(ValueError):
+    def __init__(self, report):
+        self.report = report
+        super().__init__(format_validation_report(report))
+
+    def __reduce__(self):
+        # Rebuilt from the report when raised in a channel worker process
+        return (DataValidationError, (self.report,))
+
+def find_row_ranges(mask, row_offset=0):
+    # Contiguous runs of flagged rows as inclusive (first, last) row numbers
+    flagged = np.flatnonzero(mask)
+    if len(flagged) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(flagged) > 1)
+    firsts = np.concatenate(([flagged[0]], flagged[breaks + 1])) + row_offset
+    lasts = np.concatenate((flagged[breaks], [flagged[-1]])) + row_offset
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+def format_validation_report(report):
+    lines = ["Data validation failed:"]
+    for issue, ranges in report.items():
+        shown = ", ".join(f"{first}" if first == last else f"{first}-{last}" for first, last in ranges[:MAX_RANGES_SHOWN])
+        more = f" (+{len(ranges) - MAX_RANGES_SHOWN} more ranges)" if len(ranges) > MAX_RANGES_SHOWN else ""
+        lines.append(f"  {issue}: rows {shown}{more}")
+    return "\n".join(lines)
+
+def merge_reports(report, chunk_report):
+    for issue, ranges in chunk_report.items():
+        report.setdefault(issue, []).extend(ranges)
+    return report
+
+def validation_settings(config):
+    # Keyword arguments for process_data from the [DEFAULT] section of config.ini
+    def limit(key):
+        value = config['DEFAULT'].get(key, 'auto')
+        return None if value == 'auto' else float(value)
+
+    return {
+        'bad_row_policy': config['DEFAULT'].get('badrowpolicy', 'fail'),
+        'voltage_range': (limit('voltagelimitmin'), limit('voltagelimitmax')),
+    }
+
+def validation_signature(bad_row_policy='fail', voltage_range=None):
+    # The settings processed data was cleaned with; cached data made under other ones is stale
+    low, high = voltage_range or (None, None)
+    return (bad_row_policy, low, high)
+
+def validate_channel_data(chunk, policy='fail', voltage_range=None, row_offset=0, last_cycle=None):
+    # Check a whole chunk at once and return (clean chunk, report, highest cycle index).
+    # The report maps each issue to the offending row ranges; rows are numbered from
+    # row_offset so that ranges stay meaningful across continuation sheets.
+    if policy not in BAD_ROW_POLICIES:
+        raise ValueError(f"Unknown bad row policy '{policy}'. Choose from: {', '.join(BAD_ROW_POLICIES)}")
+    for column in ('Cycle_Index', 'Voltage(V)', 'Current(A)'):
+        if column not in chunk.columns:
+            raise KeyError(f"The required column '{column}' is missing from the data.")
+
+    raw_cycles = chunk['Cycle_Index']
+    cycles = pd.to_numeric(raw_cycles, errors='coerce').to_numpy(dtype=np.float64)
+    voltage = pd.to_numeric(chunk['Voltage(V)'], errors='coerce').to_numpy(dtype=np.float64)
+    current = pd.to_numeric(chunk['Current(A)'], errors='coerce').to_numpy(dtype=np.float64)
+
+    masks = {
+        'Missing Cycle_Index': raw_cycles.isna().to_numpy(),
+        'Non-numeric Cycle_Index': np.isnan(cycles) & raw_cycles.notna().to_numpy(),
+        'Non-integer Cycle_Index': ~np.isnan(cycles) & (cycles != np.floor(cycles)),
+        'Missing Voltage(V)': chunk['Voltage(V)'].isna().to_numpy(),
+        'Non-numeric Voltage(V)': np.isnan(voltage) & chunk['Voltage(V)'].notna().to_numpy(),
+        'Missing Current(A)': chunk['Current(A)'].isna().to_numpy(),
+        'Non-numeric Current(A)': np.isnan(current) & chunk['Current(A)'].notna().to_numpy(),
+    }
+
+    low, high = voltage_range or (None, None)
+    out_of_range = np.zeros(len(chunk), dtype=bool)
+    if low is not None:
+        out_of_range |= voltage < low
+    if high is not None:
+        out_of_range |= voltage > high
+    masks['Voltage(V) out of range'] = out_of_range
+
+    # A cycle index below the highest one seen so far (in this or earlier chunks) means
+    # rows are out of order. Comparing with the running maximum flags the whole block
+    # that went back, not just its first row.
+    integer_cycles = np.where(masks['Non-integer Cycle_Index'], np.nan, cycles)
+    seed = np.nan if last_cycle is None else last_cycle
+    running_max = np.fmax.accumulate(np.concatenate(([seed], integer_cycles)))
+    masks['Non-monotonic Cycle_Index'] = ~np.isnan(integer_cycles) & (integer_cycles < running_max[:-1])
+
+    report = {issue: find_row_ranges(mask, row_offset) for issue, mask in masks.items() if mask.any()}
+
+    if not np.isnan(running_max[-1]):
+        last_cycle = running_max[-1]
+
+    if not report or policy == 'fail':
+        cleaned = chunk.assign(**{'Cycle_Index': cycles, 'Voltage(V)': voltage, 'Current(A)': current})
+        return cleaned, report, last_cycle
+
+    cycle_bad = (masks['Missing Cycle_Index'] | masks['Non-numeric Cycle_Index']
+                 | masks['Non-integer Cycle_Index'] | masks['Non-monotonic Cycle_Index'])
+    voltage_bad = np.isnan(voltage) | out_of_range
+    current_bad = np.isnan(current)
+
+    if policy == 'interpolate':
+        # Rebuild bad voltage/current samples from their neighbours; rows without a usable
+        # cycle index, or at the edge of the chunk, cannot be repaired and are dropped
+        voltage = pd.Series(np.where(voltage_bad, np.nan, voltage)).interpolate(limit_area='inside').to_numpy()
+        current = pd.Series(current).interpolate(limit_area='inside').to_numpy()
+        drop = cycle_bad | np.isnan(voltage) | np.isnan(current)
+    else:
+        drop = cycle_bad | voltage_bad | current_bad
+
+    cleaned = chunk.assign(**{'Cycle_Index': cycles, 'Voltage(V)': voltage, 'Current(A)': current})[~drop]
+    repaired = int(np.count_nonzero((voltage_bad | current_bad) & ~drop)) if policy == 'interpolate' else 0
+    logging.warning(f"Rows {row_offset}-{row_offset + len(chunk) - 1}: dropped {int(np.count_nonzero(drop))}, "
+                    f"interpolated {repaired} bad row(s)")
+    return cleaned, report, last_cycle